@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from utils.latex_stream import latex_chunks
+
+
+def regex_chunks(stream):
+    """The per-chunk regex loop the hint and solution streams used before LatexStreamChunker."""
+    latex_buffer = ""
+    for content in stream:
+        latex_buffer += content
+        while True:
+            inline_match = re.search(r'\$(.+?)\$', latex_buffer)
+            display_match = re.search(r'\$\$(.+?)\$\$', latex_buffer)
+            if inline_match:
+                yield " " + inline_match.group(0)
+                latex_buffer = latex_buffer.replace(inline_match.group(0), '', 1)
+            elif display_match:
+                yield " " + display_match.group(0)
+                latex_buffer = latex_buffer.replace(display_match.group(0), '', 1)
+            else:
+                break
+        if not re.search(r'[\$]', latex_buffer):
+            yield latex_buffer
+            latex_buffer = ""
+    if latex_buffer:
+        yield latex_buffer
+
+
+def synthetic_stream(n_chars, math_ratio, chunk_size, seed=0):
+    """Model-like output of about n_chars, split into chunks of 1..chunk_size characters."""
+    rng = random.Random(seed)
+    words = ["the", "value", "of", "equation", "gives", "therefore", "so", "area", "is"]
+    spans = [r"$x^2 + y^2$", r"$\frac{a}{b}$", r"$$\sqrt{b^2 - 4ac}$$", r"$$\int_0^1 x\,dx$$"]
+    parts, size = [], 0
+    while size < n_chars:
+        piece = rng.choice(spans) if rng.random() < math_ratio else rng.choice(words)
+        parts.append(piece)
+        size += len(piece) + 1
+    text = " ".join(parts)
+    chunks, i = [], 0
+    while i < len(text):
+        step = rng.randint(1, chunk_size)
+        chunks.append(text[i:i + step])
+        i += step
+    return chunks
+
+
+def long_open_span(n_chars, chunk_size):
+    """Worst case for the regex loop: one "$" early and the closing one at the very end."""
+    text = "Consider $" + "x + " * (n_chars // 4) + "y$ done."
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def bench(fn, chunks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in fn(chunks):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the LaTeX stream chunker with the old regex loop")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 20_000, 100_000],
+                        help="Output sizes in characters")
+    parser.add_argument("--chunk-size", type=int, default=8,
+                        help="Largest streamed chunk, in characters")
+    parser.add_argument("--math-ratio", type=float, default=0.2,
+                        help="Share of tokens that are math spans")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'workload':<14}{'chars':>9}{'chunks':>9}{'regex (ms)':>13}{'chunker (ms)':>14}{'speedup':>9}")
+    for size in args.sizes:
+        for name, chunks in (
+            ("mixed", synthetic_stream(size, args.math_ratio, args.chunk_size)),
+            ("long span", long_open_span(size, args.chunk_size)),
+        ):
+            old = bench(regex_chunks, chunks, args.repeat)
+            new = bench(latex_chunks, chunks, args.repeat)
+            chars = sum(len(c) for c in chunks)
+            print(f"{name:<14}{chars:>9}{len(chunks):>9}{old * 1000:>13.2f}{new * 1000:>14.2f}{old / new:>8.1f}x")
@@ -0,0 +1,168 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, "processing"))
+
+from stub_llm_server import add_profile_arguments, server_from_args
+
+PATHS = ["hint", "solution", "image", "verification"]
+
+
+def stub_environment(base_url, models):
+    """Point every model list at a STUB provider; set before generate and pdf_to_questions read it."""
+    os.environ["PROVIDERS"] = json.dumps(["STUB"])
+    os.environ["STUB_API_KEY"] = "stub-key"
+    os.environ["STUB_BASE_URL"] = base_url
+    model_list = json.dumps([f"STUB/{m}" for m in models])
+    for name in ("HINT_MODELS", "SOLUTION_MODELS", "IMAGE_MODELS", "PERFORMANCE_ANALYSIS_MODELS",
+                 "VERIFICATION_MODELS"):
+        os.environ[name] = model_list
+
+
+def blank_png(path):
+    """A 1x1 white PNG, enough for the image path (the stub ignores the pixels)."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(b"\x00\xff\xff\xff")))
+        f.write(chunk(b"IEND", b""))
+
+
+def timed_stream(events, is_first=bool):
+    """(seconds to the first event is_first accepts, total seconds) of consuming a generator."""
+    start = time.perf_counter()
+    first = None
+    for event in events:
+        if first is None and is_first(event):
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def make_runners(image_path):
+    import generate
+    import pdf_to_questions
+    from pdf_prompts import get_verification_prompt, get_verification_system_prompt
+
+    # Both modules log every request at DEBUG/INFO; keep the report readable
+    logging.getLogger().setLevel(logging.WARNING)
+
+    options = {"a": "$3$", "b": "$4$", "c": "$9$", "d": "$-3$"}
+
+    def hint(i):
+        # Distinct questions, so requests are not answered by one coalesced stream
+        return timed_stream(generate.stream_hint(f"Question {i}: solve $x^2 = 9$ for $x > 0$."))
+
+    def solution(i):
+        return timed_stream(generate.stream_solution(f"Question {i}: solve $x^2 = 9$ for $x > 0$.", "$3$", "$-3$", options))
+
+    def image(i):
+        def failed(event):
+            if event.get("type") == "error":
+                raise RuntimeError(event.get("message"))
+            return event.get("type") == "progress"
+        return timed_stream(generate.analyze_files([image_path]), failed)
+
+    def verification(i):
+        start = time.perf_counter()
+        result, _ = pdf_to_questions.model_inference(
+            "verification",
+            system_prompt=get_verification_system_prompt(),
+            prompt=get_verification_prompt(question=f"Question {i}: solve $x^2 = 9$ for $x > 0$.", options=options),
+            response_format="json_object",
+            reasoning_effort="low",
+        )
+        if result.get("answer") not in options:
+            raise ValueError(f"Unexpected verification result: {result}")
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+
+    return {"hint": hint, "solution": solution, "image": image, "verification": verification}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_path(fn, requests, concurrency):
+    def one(i):
+        try:
+            return fn(i)
+        except Exception as e:
+            return e
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    ok = [r for r in results if not isinstance(r, Exception)]
+    errors = [r for r in results if isinstance(r, Exception)]
+    return ok, errors, wall
+
+
+def ms(value):
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark the generate.py and pdf_to_questions.py LLM paths against a local stub provider. "
+                    "Needs a valid backend/.env (as the app does); its providers and model lists are "
+                    "overridden for this run."
+    )
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per path")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--models", nargs="+", default=["fast"],
+                        help="Stub model names in every model list (give them profiles with --model)")
+    parser.add_argument("--base-url", default=None,
+                        help="Use an already running stub_llm_server.py instead of starting one")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    stub = None
+    base_url = args.base_url
+    if base_url is None:
+        stub = server_from_args(args).start()
+        base_url = stub.base_url
+    stub_environment(base_url, args.models)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "page.png")
+        blank_png(image_path)
+        runners = make_runners(image_path)
+
+        print(f"Stub provider at {base_url}; {args.requests} requests per path, concurrency {args.concurrency}")
+        print(f"{'path':<14}{'ok':>5}{'errors':>8}{'req/s':>8}{'first p50':>11}{'first p95':>11}"
+              f"{'total p50':>11}{'total p95':>11}")
+        for path in args.paths:
+            # analyze_files prints the request content
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                ok, errors, wall = run_path(runners[path], args.requests, args.concurrency)
+            firsts = [first for first, _ in ok if first is not None]
+            totals = [total for _, total in ok]
+            print(f"{path:<14}{len(ok):>5}{len(errors):>8}{len(ok) / wall:>8.1f}"
+                  f"{ms(percentile(firsts, 50)):>11}{ms(percentile(firsts, 95)):>11}"
+                  f"{ms(percentile(totals, 50)):>11}{ms(percentile(totals, 95)):>11}")
+            if errors:
+                print(f"{'':<14}first error: {type(errors[0]).__name__}: {str(errors[0])[:120]}")
+
+    if stub is not None:
+        print(f"stub: {stub.snapshot()}")
+        stub.stop()
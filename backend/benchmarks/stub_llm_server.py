@@ -0,0 +1,336 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# Canned answers, picked by what the prompt asks for
+_XML_MARKER = "<total_questions>"                       # utils.prompts.IMAGE_ANALYSIS_PROMPT
+_VERIFY_MARKER = "verify if the given answer is correct"  # processing.pdf_prompts.get_verification_prompt
+
+_TEXT_RESPONSE = (
+    "Start from the definition. For a right triangle with legs $a$ and $b$, "
+    "the hypotenuse satisfies $c^2 = a^2 + b^2$, so with $a = 3$ and $b = 4$ "
+    "we get $$c = \\sqrt{3^2 + 4^2} = 5$$ which rules out the other options. "
+    "Check the units as well: lengths in $cm$ give an area in $cm^2$, and "
+    "$\\frac{1}{2} \\times 3 \\times 4 = 6$ confirms the working."
+)
+
+_TOKEN = re.compile(r"\S+\s*")
+
+
+class StubProfile:
+    """
+    How the stub behaves for one model: seconds to the first token, tokens per
+    second after it, and the share of requests failed with a 500 or a 429.
+    """
+
+    def __init__(
+        self,
+        ttft: float = 0.3,
+        tokens_per_sec: float = 200.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+    ) -> None:
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+    def with_overrides(self, spec: str) -> "StubProfile":
+        """A copy with the "name=value,..." settings of a --model option applied."""
+        profile = StubProfile(**vars(self))
+        for item in filter(None, spec.split(",")):
+            name, _, value = item.partition("=")
+            name = name.strip().replace("-", "_")
+            if name not in vars(profile):
+                raise ValueError(f"Unknown stub setting: {name}")
+            setattr(profile, name, float(value))
+        return profile
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(p.get("text", "") for p in content if isinstance(p, dict))
+    return "\n".join(parts)
+
+
+def _xml_response(n_questions: int) -> str:
+    questions = "".join(
+        f"  <question>\n"
+        f"    <question_text>Stub question {i}: what is $\\sqrt{{{(i + 1) ** 2}}}$?</question_text>\n"
+        f"    <a>${i + 1}$</a>\n"
+        f"    <b>${i + 2}$</b>\n"
+        f"    <c>${(i + 1) ** 2}$</c>\n"
+        f"    <d>${i}$</d>\n"
+        f"    <answer>a</answer>\n"
+        f"  </question>\n"
+        for i in range(1, n_questions + 1)
+    )
+    return (
+        f"<response>\n<total_questions>{n_questions}</total_questions>\n"
+        f"<questions>\n{questions}</questions>\n</response>"
+    )
+
+
+def _verification_response() -> str:
+    return json.dumps({
+        "solution": "Squaring both sides gives $x^2 = 9$, and only $x = 3$ is among the options.",
+        "answer": "a",
+    }, indent=4)
+
+
+def canned_response(body: Dict[str, Any], n_questions: int) -> str:
+    """The reply for a chat completions request body."""
+    prompt = _prompt_text(body.get("messages") or [])
+    if _XML_MARKER in prompt:
+        return _xml_response(n_questions)
+    if _VERIFY_MARKER in prompt or (body.get("response_format") or {}).get("type") == "json_object":
+        return _verification_response()
+    return _TEXT_RESPONSE
+
+
+class StubLLMServer:
+    """
+    OpenAI-compatible chat completions endpoint (streaming and not) for load
+    tests and benchmarks without a real provider. Point a provider's
+    PROVIDER_BASE_URL at `base_url` and use any API key; model names are free,
+    and a model with no profile of its own uses the default one.
+
+    Replies are canned: the XML of IMAGE_ANALYSIS_PROMPT, the JSON of the
+    answer verification prompt (or any json_object request), otherwise
+    markdown with inline and display LaTeX. GET /stats returns request counts.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        default: Optional[StubProfile] = None,
+        models: Optional[Dict[str, StubProfile]] = None,
+        questions: int = 10,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.default = default or StubProfile()
+        self.models = models or {}
+        self.questions = questions
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0, "active": 0, "peak_active": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def profile(self, model: str) -> StubProfile:
+        return self.models.get(model, self.default)
+
+    def start(self) -> "StubLLMServer":
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def _outcome(self, profile: StubProfile) -> Optional[int]:
+        """429, 500 or None (succeed) for the next request."""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+        if roll < profile.rate_limit_rate:
+            return 429
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            return 500
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_event(self, payload: Any) -> None:
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                event = b"data: " + data + b"\n\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._send_json(200, server.snapshot())
+                elif self.path.rstrip("/").endswith("/models"):
+                    names = sorted(server.models) or ["stub"]
+                    self._send_json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in names]})
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                model = body.get("model", "stub")
+                profile = server.profile(model)
+                outcome = server._outcome(profile)
+                if outcome == 429:
+                    with server._lock:
+                        server.stats["rate_limited"] += 1
+                    self._send_json(
+                        429,
+                        {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}},
+                        {"Retry-After": f"{profile.retry_after:g}"},
+                    )
+                    return
+                if outcome == 500:
+                    with server._lock:
+                        server.stats["errors"] += 1
+                    self._send_json(500, {"error": {"message": "Injected failure (stub)", "type": "server_error"}})
+                    return
+
+                with server._lock:
+                    server.stats["active"] += 1
+                    server.stats["peak_active"] = max(server.stats["peak_active"], server.stats["active"])
+                try:
+                    text = canned_response(body, server.questions)
+                    tokens = _TOKEN.findall(text)
+                    usage = {
+                        "prompt_tokens": len(_prompt_text(body.get("messages") or [])) // 4,
+                        "completion_tokens": len(tokens),
+                    }
+                    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                    interval = 1.0 / profile.tokens_per_sec if profile.tokens_per_sec > 0 else 0.0
+                    if body.get("stream"):
+                        with server._lock:
+                            server.stats["streams"] += 1
+                        self._stream(body, model, tokens, usage, profile.ttft, interval)
+                    else:
+                        time.sleep(profile.ttft + interval * len(tokens))
+                        self._send_json(200, {
+                            "id": "chatcmpl-stub",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [{
+                                "index": 0,
+                                "message": {"role": "assistant", "content": text},
+                                "finish_reason": "stop",
+                            }],
+                            "usage": usage,
+                        })
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on the stream (hedge loser, cancelled request)
+                finally:
+                    with server._lock:
+                        server.stats["active"] -= 1
+
+            def _stream(self, body, model, tokens, usage, ttft, interval):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def chunk(delta, finish_reason=None):
+                    return {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    }
+
+                time.sleep(ttft)
+                self._send_event(chunk({"role": "assistant", "content": ""}))
+                for token in tokens:
+                    self._send_event(chunk({"content": token}))
+                    time.sleep(interval)
+                self._send_event(chunk({}, "stop"))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._send_event({
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [],
+                        "usage": usage,
+                    })
+                self._send_event(b"[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    """The default-profile options, shared with the benchmarks that start a stub."""
+    parser.add_argument("--ttft", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tps", type=float, default=200.0, help="Tokens per second after the first")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of the 429 responses, in seconds")
+    parser.add_argument("--model", action="append", default=[], metavar="NAME:SETTINGS",
+                        help="Per-model profile, e.g. slow:ttft=2,tps=20 or flaky:error_rate=0.3")
+    parser.add_argument("--questions", type=int, default=10, help="Questions in the image analysis XML")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for error and 429 injection")
+
+
+def server_from_args(args: argparse.Namespace, host: str = "127.0.0.1", port: int = 0) -> StubLLMServer:
+    default = StubProfile(args.ttft, args.tps, args.error_rate, args.rate_limit_rate, args.retry_after)
+    models = {}
+    for spec in args.model:
+        name, _, settings = spec.partition(":")
+        models[name] = default.with_overrides(settings)
+    return StubLLMServer(host, port, default, models, args.questions, args.seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub provider for offline load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    stub = server_from_args(args, args.host, args.port)
+    print(f"Stub provider listening on {stub.base_url}")
+    print("Set e.g. PROVIDERS=[\"STUB\"], STUB_API_KEY=anything, "
+          f"STUB_BASE_URL={stub.base_url} and HINT_MODELS=[\"STUB/fast\"]")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,14 +1,18 @@
 import os
 import threading
 import queue
+import time
 from datetime import datetime
 from pytz import timezone
 from typing import Any, Dict, List, Optional, Tuple
 from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
+from bson.int64 import Int64
 from dotenv import load_dotenv
 import hashlib
+import numpy as np
 
 # Load environment variables
 load_dotenv()
@@ -113,6 +117,10 @@ class WriteQueue:
             finally:
                 self._q.task_done()
 
+    def flush(self) -> None:
+        """Block until every queued operation has been processed."""
+        self._q.join()
+
     def stop(self) -> None:
         self._stop_event.set()
         for t in self._workers:
@@ -661,7 +669,18 @@ class TestRepository:
         self.write_queue.enqueue("test_add", callable=_op)
         return test_data
 
-    def get_test(self, test_id: str, is_class10: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+    def get_test(
+        self,
+        test_id: str,
+        is_class10: Optional[bool] = None,
+        include_inactive: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        doc = self._get_active_test(test_id, is_class10)
+        if doc is None and include_inactive:
+            doc = self._get_inactive_test(test_id, is_class10)
+        return doc
+
+    def _get_active_test(self, test_id: str, is_class10: Optional[bool]) -> Optional[Dict[str, Any]]:
         with self._lock:
             if is_class10 is None:
                 if test_id in self._cache9:
@@ -693,6 +712,23 @@ class TestRepository:
             self._set_cached_test(doc)
         return doc
 
+    def _get_inactive_test(self, test_id: str, is_class10: Optional[bool]) -> Optional[Dict[str, Any]]:
+        """Expired tests, still needed to read the exams taken on them."""
+        flags = (False, True) if is_class10 is None else (is_class10,)
+        for flag in flags:
+            with self._lock:
+                cached = self._inactive_for(flag).get(test_id)
+            if cached is not None:
+                return cached
+            col = self.db_client.get_collection("InactiveTests", is_class10=flag)
+            doc = col.find_one({"test-id": test_id})
+            if doc:
+                doc.pop("_id", None)
+                with self._lock:
+                    self._inactive_for(flag)[test_id] = doc
+                return doc
+        return None
+
     def get_all_tests(self, is_class10: Optional[bool] = None) -> List[Dict[str, Any]]:
         # Fetch from DB to ensure completeness, then backfill cache
         if is_class10 is None:
@@ -813,6 +849,303 @@ class TestRepository:
         print(f"Finished pre-loading. Total active tests loaded into cache: {total_count}.")
 
 
+# -----------------------------------------------------------------------------
+# Question History Repository (per user + lesson bitsets) with RAM cache
+# -----------------------------------------------------------------------------
+
+class QuestionHistoryRepository:
+    """
+    Tracks which bank questions a user has already been given, as one bitset
+    per (user, lesson) over the lesson's question indexes, persisted as arrays
+    of int64 words. available_mask() reads the bitset from the DB every time,
+    so questions another worker process marked are never handed out again;
+    writes use $bit so several workers can mark questions for the same user
+    without clobbering each other. RAM only holds this process's writes that
+    the write queue has not applied yet, merged into what is read.
+
+    Each bitset is stored with the lesson's signature
+    (utils.question_bank.lesson_signature). Once a reload edits, adds, removes
+    or reorders questions, bit positions no longer mean the same questions, so
+    a bitset with another signature is treated as empty.
+    """
+
+    def __init__(self, db_client: DatabaseClient, write_queue: WriteQueue) -> None:
+        self.db_client = db_client
+        self.write_queue = write_queue
+
+        # (user_id, lesson_id) -> {"size": int, "sig": str, "bits": bytearray, "ops": int, "reset": bool}
+        # for writes still waiting in the write queue
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+        for std in (9, 10):
+            col = db_client.get_collection("QuestionHistory", standard=std)
+            col.create_index([("userId", ASCENDING), ("lesson", ASCENDING)], unique=True)
+
+    @staticmethod
+    def _standard_of(lesson_id: str) -> int:
+        # lesson ids look like "9/math/lesson1"
+        return 10 if lesson_id.split("/", 1)[0] == "10" else 9
+
+    def _col(self, lesson_id: str) -> Collection:
+        return self.db_client.get_collection("QuestionHistory", standard=self._standard_of(lesson_id))
+
+    @staticmethod
+    def _bits_from_words(words: List[int], size: int) -> bytearray:
+        bits = bytearray(b"".join(int(w).to_bytes(8, "little", signed=True) for w in words))
+        nbytes = (size + 7) // 8
+        return (bits + bytearray(max(0, nbytes - len(bits))))[:nbytes]
+
+    @staticmethod
+    def _empty_doc(size: int, signature: str) -> Dict[str, Any]:
+        return {"size": size, "sig": signature, "words": [Int64(0)] * ((size + 63) // 64)}
+
+    def _new_pending(self, key: Tuple[str, str], size: int, signature: str, reset: bool) -> Dict[str, Any]:
+        entry = {"size": size, "sig": signature, "bits": bytearray((size + 7) // 8), "ops": 0, "reset": reset}
+        self._pending[key] = entry
+        return entry
+
+    def _applied(self, key: Tuple[str, str], entry: Dict[str, Any]) -> None:
+        """A queued write of `entry` has run (or failed); forget it once none are left."""
+        with self._lock:
+            entry["ops"] -= 1
+            if entry["ops"] == 0 and self._pending.get(key) is entry:
+                del self._pending[key]
+
+    def available_mask(self, user_id: str, lesson_id: str, size: int, signature: str = "") -> np.ndarray:
+        """Boolean array of length size, True where the question is still unused."""
+        key = (user_id, lesson_id)
+        # Pending writes first: once they are applied and dropped, the read below sees them
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None and entry["size"] == size and entry["sig"] == signature:
+                pending, reset = bytes(entry["bits"]), entry["reset"]
+            else:
+                pending, reset = None, False
+
+        doc = None if reset else self._col(lesson_id).find_one(
+            {"userId": user_id, "lesson": lesson_id}, {"size": 1, "sig": 1, "words": 1}
+        )
+        if doc and doc.get("size") == size and doc.get("sig", "") == signature:
+            bits = np.frombuffer(bytes(self._bits_from_words(doc.get("words", []), size)), dtype=np.uint8)
+        else:
+            # Unknown, reset, or the lesson's questions changed since: start from scratch
+            bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+        if pending is not None:
+            bits = bits | np.frombuffer(pending, dtype=np.uint8)
+        used = np.unpackbits(bits, count=size, bitorder="little")
+        return used == 0
+
+    def mark_used(self, user_id: str, lesson_id: str, indexes: List[int], size: int, signature: str = "") -> None:
+        key = (user_id, lesson_id)
+        words: Dict[int, int] = {}
+        for i in indexes:
+            words[i >> 6] = words.get(i >> 6, 0) | (1 << (i & 63))
+        if not words:
+            return
+        update = {
+            f"words.{w}": {"or": Int64(value - (1 << 64) if value >= 1 << 63 else value)}
+            for w, value in words.items()
+        }
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None or entry["size"] != size or entry["sig"] != signature:
+                entry = self._new_pending(key, size, signature, reset=False)
+            for i in indexes:
+                entry["bits"][i >> 3] |= 1 << (i & 7)
+            entry["ops"] += 1
+
+        def _op():
+            try:
+                col = self._col(lesson_id)
+                owner = {"userId": user_id, "lesson": lesson_id}
+                current = {**owner, "size": size, "sig": signature}
+                if col.update_one(current, {"$bit": update}).matched_count:
+                    return
+                # First write, or the lesson changed: clear an outdated bitset, or
+                # create an empty one, then OR in. Neither step overwrites bits
+                # another worker has already set for this signature.
+                col.update_one(
+                    {**owner, "$or": [{"size": {"$ne": size}}, {"sig": {"$ne": signature}}]},
+                    {"$set": self._empty_doc(size, signature)},
+                )
+                try:
+                    col.update_one(owner, {"$setOnInsert": self._empty_doc(size, signature)}, upsert=True)
+                except DuplicateKeyError:
+                    pass  # another worker inserted it first
+                col.update_one(current, {"$bit": update})
+            finally:
+                self._applied(key, entry)
+
+        self.write_queue.enqueue("question_history_mark_used", callable=_op)
+
+    def reset(self, user_id: str, lesson_id: str, size: int, signature: str = "") -> None:
+        key = (user_id, lesson_id)
+        with self._lock:
+            # Until the write runs, reads ignore the stored bitset
+            entry = self._new_pending(key, size, signature, reset=True)
+            entry["ops"] += 1
+
+        def _op():
+            try:
+                self._col(lesson_id).update_one(
+                    {"userId": user_id, "lesson": lesson_id},
+                    {"$set": self._empty_doc(size, signature)},
+                    upsert=True,
+                )
+            finally:
+                self._applied(key, entry)
+
+        self.write_queue.enqueue("question_history_reset", callable=_op)
+
+
+# -----------------------------------------------------------------------------
+# Hint Cache Repository (content-addressed, segregated by class DB)
+# -----------------------------------------------------------------------------
+
+class HintCacheRepository:
+    """
+    Finished hint text keyed by the question's content hash
+    (utils.question_bank.content_hash), so every student asking for a hint on
+    the same question shares one LLM generation. Hits are kept in RAM.
+    """
+
+    def __init__(self, db_client: DatabaseClient, write_queue: WriteQueue) -> None:
+        self.db_client = db_client
+        self.write_queue = write_queue
+
+        # RAM caches: content hash -> hint text
+        self._cache9: Dict[str, str] = {}
+        self._cache10: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+        for std in (9, 10):
+            col = db_client.get_collection("HintCache", standard=std)
+            col.create_index([("hash", ASCENDING)], unique=True)
+
+    def _cache_for(self, standard: int) -> Dict[str, str]:
+        return self._cache10 if int(standard) == 10 else self._cache9
+
+    def get(self, content_hash: str, standard: int) -> Optional[str]:
+        with self._lock:
+            hint = self._cache_for(standard).get(content_hash)
+        if hint is not None:
+            return hint
+        doc = self.db_client.get_collection("HintCache", standard=standard).find_one(
+            {"hash": content_hash}, {"hint": 1}
+        )
+        if not doc:
+            return None
+        with self._lock:
+            self._cache_for(standard)[content_hash] = doc["hint"]
+        return doc["hint"]
+
+    def put(self, content_hash: str, hint: str, standard: int) -> None:
+        with self._lock:
+            self._cache_for(standard)[content_hash] = hint
+
+        def _op():
+            col = self.db_client.get_collection("HintCache", standard=standard)
+            col.update_one(
+                {"hash": content_hash},
+                {"$set": {
+                    "hint": hint,
+                    "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }},
+                upsert=True,
+            )
+
+        self.write_queue.enqueue("hint_cache_put", callable=_op)
+
+    def flush(self) -> None:
+        """Wait until queued hint writes have reached the DB."""
+        self.write_queue.flush()
+
+    def cached_hashes(self, standard: int) -> set:
+        """Every content hash that already has a hint, straight from the DB."""
+        col = self.db_client.get_collection("HintCache", standard=standard)
+        return {doc["hash"] for doc in col.find({}, {"hash": 1, "_id": 0})}
+
+
+# -----------------------------------------------------------------------------
+# Solution Cache Repository (shared explanations, segregated by class DB)
+# -----------------------------------------------------------------------------
+
+class SolutionCacheRepository:
+    """
+    Explanations for "chose X instead of Y" on a question, shared by every
+    student who makes the same mistake. Entries are keyed by key_for(question
+    key, correct option text, chosen option text), so they do not depend on
+    the option order a student saw. Hits are kept in RAM.
+    """
+
+    def __init__(self, db_client: DatabaseClient, write_queue: WriteQueue) -> None:
+        self.db_client = db_client
+        self.write_queue = write_queue
+
+        # RAM caches: key -> solution text
+        self._cache9: Dict[str, str] = {}
+        self._cache10: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+        for std in (9, 10):
+            col = db_client.get_collection("SolutionCache", standard=std)
+            col.create_index([("key", ASCENDING)], unique=True)
+            col.create_index([("question", ASCENDING)])
+
+    @staticmethod
+    def key_for(question_key: str, correct_answer: str, chosen_answer: str) -> str:
+        """question_key is the question's qid, or its content hash when it has none."""
+        def norm(text: str) -> str:
+            return " ".join(str(text).lower().split())
+        raw = "\x1f".join([question_key, norm(correct_answer), norm(chosen_answer)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _cache_for(self, standard: int) -> Dict[str, str]:
+        return self._cache10 if int(standard) == 10 else self._cache9
+
+    def get(self, key: str, standard: int) -> Optional[str]:
+        with self._lock:
+            solution = self._cache_for(standard).get(key)
+        if solution is not None:
+            return solution
+        doc = self.db_client.get_collection("SolutionCache", standard=standard).find_one(
+            {"key": key}, {"solution": 1}
+        )
+        if not doc:
+            return None
+        with self._lock:
+            self._cache_for(standard)[key] = doc["solution"]
+        return doc["solution"]
+
+    def put(self, key: str, solution: str, standard: int, question_key: Optional[str] = None) -> None:
+        with self._lock:
+            self._cache_for(standard)[key] = solution
+
+        def _op():
+            col = self.db_client.get_collection("SolutionCache", standard=standard)
+            col.update_one(
+                {"key": key},
+                {"$set": {
+                    "solution": solution,
+                    "question": question_key,
+                    "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }},
+                upsert=True,
+            )
+
+        self.write_queue.enqueue("solution_cache_put", callable=_op)
+
+    def flush(self) -> None:
+        """Wait until queued solution writes have reached the DB."""
+        self.write_queue.flush()
+
+    def cached_keys(self, standard: int) -> set:
+        """Every key that already has a solution, straight from the DB."""
+        col = self.db_client.get_collection("SolutionCache", standard=standard)
+        return {doc["key"] for doc in col.find({}, {"key": 1, "_id": 0})}
+
+
 # -----------------------------------------------------------------------------
 # Leaderboard Service (segregated per class DB)
 # -----------------------------------------------------------------------------
@@ -1009,6 +1342,9 @@ _write_queue = WriteQueue(_db_client, worker_count=1)
 user_repo = UserRepository(_db_client, _write_queue)
 exam_repo = ExamRepository(_db_client, _write_queue)
 test_repo = TestRepository(_db_client, _write_queue)
+question_history_repo = QuestionHistoryRepository(_db_client, _write_queue)
+hint_cache_repo = HintCacheRepository(_db_client, _write_queue)
+solution_cache_repo = SolutionCacheRepository(_db_client, _write_queue)
 leaderboard_service = LeaderboardService(_db_client, user_repo, _write_queue)
 
 
@@ -1030,10 +1366,16 @@ __all__ = [
     "UserRepository",
     "ExamRepository",
     "TestRepository",
+    "QuestionHistoryRepository",
+    "HintCacheRepository",
+    "SolutionCacheRepository",
     "LeaderboardService",
     "user_repo",
     "exam_repo",
     "test_repo",
+    "question_history_repo",
+    "hint_cache_repo",
+    "solution_cache_repo",
     "leaderboard_service",
     "convert_objectid_to_str",
     "preload_caches",
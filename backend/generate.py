@@ -1,9 +1,6 @@
-import random
 import json
-from openai import OpenAI
+import numpy as np
 import os
-import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import traceback
 from typing import Dict, Tuple
@@ -11,10 +8,15 @@ from utils.generate_utils import (
     encode_image_to_base64,
     extract_tag_content,
     parse_question_xml,
-    shuffle_question_options,
-    remove_duplicates_and_replace,
-    parse_questions_from_json
+    random_option_permutation,
 )
+from utils.question_bank import question_bank, lesson_key_from_path, lesson_id, content_hash
+from utils.question_selector import select_questions
+from utils.lesson_utils import lesson_catalog
+from utils.analysis_prompt import build_results_summary
+from utils.latex_stream import latex_chunks, latex_text
+from utils.llm_gateway import llm_gateway, prompt_fingerprint
+from utils.model_router import model_router
 from utils.prompts import (
     SOLUTION_GENERATION_PROMPT,
     PERFORMANCE_ANALYSIS_PROMPT,
@@ -32,16 +34,22 @@ load_dotenv()
 valid_providers = validate_env_config()
 
 def get_provider_config(provider: str) -> Dict[str, str]:
-    """Get API key and base URL for a specific provider."""
+    """
+    Get the (first) API key and base URL for a specific provider. The gateway
+    spreads requests over all of the provider's keys (see utils.key_pool).
+    """
     return {
         "api_key": os.getenv(f"{provider.upper()}_API_KEY"),
         "base_url": os.getenv(f"{provider.upper()}_BASE_URL"),
     }
 
-def get_random_model(model_type: str) -> Tuple[str, str, bool]:
+def get_random_model(model_type: str, exclude=()) -> Tuple[str, str, bool]:
     """
-    Selects a random model from the specified model type list in .env.
+    Picks a model from the specified model type list in .env through the
+    model router, which favours fast, healthy models and skips ones whose
+    circuit is open.
     Handles '::nothink' suffix to disable thinking.
+    Models named in `exclude` ("PROVIDER/model") are avoided when possible.
     Example: model_type='IMAGE_MODELS'
     """
     models_str = os.getenv(model_type)
@@ -51,43 +59,84 @@ def get_random_model(model_type: str) -> Tuple[str, str, bool]:
     models_list = json.loads(models_str)
     if not models_list:
         raise ValueError(f"No models configured for '{model_type}'.")
-        
-    model_full_name = random.choice(models_list)
-    
-    nothink_enabled = False
-    if model_full_name.endswith("::nothink"):
-        nothink_enabled = True
-        model_full_name = model_full_name.removesuffix("::nothink")
+
+    nothink_models = set()
+    candidates = []
+    for entry in models_list:
+        if entry.endswith("::nothink"):
+            entry = entry.removesuffix("::nothink")
+            nothink_models.add(entry)
+        candidates.append(entry)
+
+    model_full_name = model_router.choose(candidates, purpose=model_type, exclude=exclude)
+    nothink_enabled = model_full_name in nothink_models
 
     provider, model_name = model_full_name.split('/')
     return provider, model_name, nothink_enabled
 
-def get_client_for_model(model_type: str) -> Tuple[OpenAI, str, bool]:
+def routed_stream(
+    model_type: str, build_params, hedge: bool = False, share_key=None, on_complete=None, background: bool = False
+):
     """
-    Gets a random model for the given type and returns an initialized client,
-    the model name, and a flag indicating if 'nothink' is enabled.
+    Stream from a routed model of `model_type`; build_params(model_name, nothink)
+    returns the request parameters for a model. With hedge=True a second model
+    is started if the first is slow to send its first token. With a share_key,
+    concurrent identical requests share one upstream stream (see
+    LLMGateway.stream_shared). on_complete(text) is called once per upstream
+    stream that finishes. background=True runs it within the gateway's
+    background slots (LLM_BACKGROUND_CONCURRENCY).
     """
-    provider, model_name, nothink_enabled = get_random_model(model_type)
-    config = get_provider_config(provider)
-    client = OpenAI(api_key=config["api_key"], base_url=config["base_url"])
-    return client, model_name, nothink_enabled
+    chosen = {}
+
+    def target():
+        provider, model_name, nothink_enabled = get_random_model(model_type)
+        logging.debug(f"Using model for {model_type}: {model_name}")
+        chosen["model"] = f"{provider}/{model_name}"
+        return provider, get_provider_config(provider), build_params(model_name, nothink_enabled)
 
-# Add at the top of the file with other global variables
-user_question_history = {}  # Stores used question IDs per user
+    def backup():
+        backup_provider, backup_model, backup_nothink = get_random_model(
+            model_type, exclude=(chosen["model"],)
+        )
+        return (
+            backup_provider,
+            get_provider_config(backup_provider),
+            build_params(backup_model, backup_nothink),
+        )
+
+    if share_key is not None:
+        return llm_gateway.stream_shared(
+            share_key, target, backup if hedge else None, on_complete, purpose=model_type, background=background
+        )
 
-def generate_hint(question_text: str):
+    if hedge:
+        stream = llm_gateway.stream_hedged(*target(), backup, purpose=model_type, background=background)
+    else:
+        stream = llm_gateway.stream(*target(), purpose=model_type, background=background)
+    if on_complete is None:
+        return stream
+    return _call_when_finished(stream, on_complete)
+
+def _call_when_finished(stream, on_complete):
+    text = ""
+    for chunk in stream:
+        text += chunk
+        yield chunk
+    on_complete(text)
+
+def stream_hint(question_text: str, hedge: bool = False, coalesce: bool = False, scope: str = "", on_complete=None):
     """
-    Generate a helpful hint for a given question without revealing the answer, streaming the output.
+    Stream a hint for a question from the LLM; errors are raised to the caller.
     Uses HINT_MODELS from the environment configuration.
+    coalesce=True lets concurrent requests for the same question (and scope)
+    share one upstream stream; on_complete(hint) is called once per generated hint.
     """
-    try:
-        client, model_name, nothink_enabled = get_client_for_model("HINT_MODELS")
-        logging.debug(f"Using model for hints: {model_name}")
+    prompt = HINT_GENERATION_PROMPT.format(question=question_text)
+    messages = [{"role": "user", "content": prompt}]
 
-        prompt = HINT_GENERATION_PROMPT.format(question=question_text)
-        
+    def build_params(model_name, nothink_enabled):
         params = {
-            "messages": [{"role": "user", "content": prompt}],
+            "messages": messages,
             "model": model_name,
             "temperature": 0.7,
             "max_tokens": 512,
@@ -104,126 +153,92 @@ def generate_hint(question_text: str):
                 }
             }
             }
+        return params
 
-        stream = client.chat.completions.create(**params)
-
-        latex_buffer = ""
-        for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                latex_buffer += content
-                while True:
-                    inline_match = re.search(r'\$(.+?)\$', latex_buffer)
-                    display_match = re.search(r'\$\$(.+?)\$\$', latex_buffer)
-                    if inline_match:
-                        yield " " + inline_match.group(0)
-                        latex_buffer = latex_buffer.replace(inline_match.group(0), '', 1)
-                    elif display_match:
-                        yield " " + display_match.group(0)
-                        latex_buffer = latex_buffer.replace(display_match.group(0), '', 1)
-                    else:
-                        break
-                if not re.search(r'[\$]', latex_buffer):
-                    yield latex_buffer
-                    latex_buffer = ""
-        if latex_buffer:
-            yield latex_buffer
-    except Exception as e:
-        logging.error(f"Unable to generate hint: {e}")
-        yield f"Unable to generate hint: {str(e)}"
+    yield from latex_chunks(routed_stream(
+        "HINT_MODELS",
+        build_params,
+        hedge=hedge,
+        share_key=prompt_fingerprint("HINT_MODELS", messages, scope) if coalesce else None,
+        on_complete=(lambda text: on_complete(latex_text(text))) if on_complete else None,
+    ))
 
-def generate_solution_stream(question_text: str, correct_answer: str, given_answer: str, options: dict):
+def generate_hint(question_text: str, hint_cache=None, standard: int = 9, hedge: bool = False, coalesce: bool = False):
     """
-    Generate a solution for a given question with streaming output.
-    Uses SOLUTION_MODELS from the environment configuration.
+    Generate a helpful hint for a given question without revealing the answer, streaming the output.
+    When a hint cache (db.HintCacheRepository) is given, a stored hint for the same
+    question content is returned at once, and a newly generated one is stored.
+    hedge=True races a second model if the first is slow to start, and
+    coalesce=True shares one stream between concurrent requests for the same
+    question (see routed_stream).
     """
+    key = content_hash(question_text)
+    if hint_cache is not None:
+        try:
+            cached = hint_cache.get(key, standard)
+        except Exception as e:
+            logging.error(f"Hint cache lookup failed: {e}")
+            cached = None
+        if cached:
+            yield cached
+            return
+
+    def store(hint):
+        if hint.strip():
+            hint_cache.put(key, hint, standard)
+
     try:
-        client, model_name, nothink_enabled = get_client_for_model("SOLUTION_MODELS")
-        logging.debug(f"Using model for solution streaming: {model_name}")
-
-        prompt = SOLUTION_GENERATION_PROMPT.format(
-            question=question_text,
-            correct_answer=correct_answer,
-            given_answer=given_answer,
-            options=options
+        yield from stream_hint(
+            question_text,
+            hedge=hedge,
+            coalesce=coalesce,
+            scope=str(standard),
+            on_complete=store if hint_cache is not None else None,
         )
-        
-        params = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Provide direct solutions without introductory phrases. Jump straight to the answer. Do not cheerup anyone in your responses. Dont use formatting like bold (**) etc.",
-                },
-                {"role": "user", "content": prompt}
-            ],
-            "model": model_name,
-            "temperature": 0.7,
-            "max_tokens": 1024,
-            "stream": True
-        }
-
-        if nothink_enabled:
-            params['extra_body'] = {
-                "extra_body":{
-                "google": {
-                    "thinking_config": {
-                        "thinking_budget": 0
-                    }
-                }
-            }
-            }
-        
-        stream = client.chat.completions.create(**params)
-
-        latex_buffer = ""
-        for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                latex_buffer += content
-                while True:
-                    inline_match = re.search(r'\$(.+?)\$', latex_buffer)
-                    display_match = re.search(r'\$\$(.+?)\$\$', latex_buffer)
-                    if inline_match:
-                        yield " " + inline_match.group(0)
-                        latex_buffer = latex_buffer.replace(inline_match.group(0), '', 1)
-                    elif display_match:
-                        yield " " + display_match.group(0)
-                        latex_buffer = latex_buffer.replace(display_match.group(0), '', 1)
-                    else:
-                        break
-                if not re.search(r'[\$]', latex_buffer):
-                    yield latex_buffer
-                    latex_buffer = ""
-        if latex_buffer:
-            yield latex_buffer
     except Exception as e:
-        logging.error(f"Unable to generate solution: {e}")
-        yield f"Unable to generate solution: {str(e)}"
+        logging.error(f"Unable to generate hint: {e}")
+        yield f"Unable to generate hint: {str(e)}"
 
-def generate_solution(question, correct_answer, given_answer, options):
-    """Generates a solution using a randomly selected solution model."""
+def stream_solution(
+    question_text: str,
+    correct_answer: str,
+    given_answer: str,
+    options,
+    hedge: bool = False,
+    coalesce: bool = False,
+    scope: str = "",
+    on_complete=None,
+    background: bool = False,
+):
+    """
+    Stream an explanation of why correct_answer is right and given_answer is
+    wrong; errors are raised to the caller.
+    Uses SOLUTION_MODELS from the environment configuration.
+    hedge, coalesce and on_complete work as in stream_hint; background=True
+    is for work nobody is waiting on (see routed_stream).
+    """
     prompt = SOLUTION_GENERATION_PROMPT.format(
-        question=question,
+        question=question_text,
         correct_answer=correct_answer,
         given_answer=given_answer,
         options=options
     )
-    try:
-        client, model_name, nothink_enabled = get_client_for_model("SOLUTION_MODELS")
-        logging.debug(f"Generating solution with {model_name}")
-        
+
+    messages = [
+        {
+            "role": "system",
+            "content": "Provide direct solutions without introductory phrases. Jump straight to the answer. Do not cheerup anyone in your responses. Dont use formatting like bold (**) etc.",
+        },
+        {"role": "user", "content": prompt}
+    ]
+
+    def build_params(model_name, nothink_enabled):
         params = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "Provide direct solutions without introductory phrases. Jump straight to the answer.",
-                },
-                {"role": "user", "content": prompt},
-            ],
+            "messages": messages,
             "model": model_name,
             "temperature": 0.7,
             "max_tokens": 1024,
-            "stream": False,
+            "stream": True
         }
 
         if nothink_enabled:
@@ -236,47 +251,27 @@ def generate_solution(question, correct_answer, given_answer, options):
                 }
             }
             }
+        return params
 
-        chat_completion = client.chat.completions.create(**params)
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        logging.error(f"Error generating solution with {model_name}: {e}")
-        raise
-
-def process_question(question_data):
-    """Helper function to process individual questions for parallel execution"""
-    return generate_solution(
-        question_data["question"],
-        question_data["correct_answer"],
-        question_data["given_answer"],
-        question_data["options"],
-    )
+    yield from latex_chunks(routed_stream(
+        "SOLUTION_MODELS",
+        build_params,
+        hedge=hedge,
+        share_key=prompt_fingerprint("SOLUTION_MODELS", messages, scope) if coalesce else None,
+        on_complete=(lambda text: on_complete(latex_text(text))) if on_complete else None,
+        background=background,
+    ))
 
-def generate_solutions_batch(questions_list):
-    """
-    Generate solutions for a batch of questions in parallel.
-    """
-    solutions = []
-    with ThreadPoolExecutor() as executor:
-        future_to_question = {
-            executor.submit(process_question, q): q for q in questions_list
-        }
-        for future in as_completed(future_to_question):
-            question = future_to_question[future]
-            try:
-                solution = future.result()
-                solutions.append({"question": question["question"], "solution": solution})
-            except Exception as exc:
-                solutions.append({"question": question["question"], "solution": f"Error: {exc}"})
-    return solutions
 
+def generate_exam_questions(subject, lesson_files, user_id, history):
+    """
+    Pick a proportional mix of questions from the given lesson files, avoiding
+    questions the user has already seen. `history` is the per-user, per-lesson
+    bitset store (db.QuestionHistoryRepository).
 
-def generate_exam_questions(subject, lesson_files, user_id):
-    global user_question_history
-    
-    if user_id not in user_question_history:
-        user_question_history[user_id] = []
-    
+    Questions keep the bank's option order plus a "perm" option permutation;
+    use utils.generate_utils.render_question to get what the student sees.
+    """
     num_lessons = len(lesson_files)
     if num_lessons == 1:
         num_questions = 15
@@ -289,115 +284,83 @@ def generate_exam_questions(subject, lesson_files, user_id):
     else:
         num_questions = min(40 + (num_lessons - 4) * 10, 60)
 
-    all_questions = {}
-    lesson_question_counts = {}
-
+    bank = question_bank.snapshot()
+    lesson_numbers, lesson_ids, lessons, signatures = [], [], [], []
     for lesson_index, file in enumerate(lesson_files, 1):
-        try:
-            questions = parse_questions_from_json(file)
-            if not questions:
-                logging.warning(f"No questions loaded from {file}")
-                continue
-                
-            questions = shuffle_question_options(questions)
-            lesson_question_counts[lesson_index] = len(questions)
-            for q_index, question in enumerate(questions, 1):
-                question_id = f"L{lesson_index}Q{q_index}"
-                all_questions[question_id] = question
-                question["lesson"] = lesson_index
-                question["l-id"] = question_id
-        except Exception as e:
-            logging.error(f"Error processing file {file}: {e}")
+        key = lesson_key_from_path(file)
+        bank_questions = bank.get_lesson(key) if key else ()
+        if not bank_questions:
+            logging.warning(f"No questions loaded from {file}")
             continue
+        lesson_numbers.append(lesson_index)
+        lesson_ids.append(lesson_id(key))
+        lessons.append(bank_questions)
+        signatures.append(bank.lesson_signature(key))
 
-    if not all_questions:
+    if not lessons:
         raise Exception("No valid questions could be loaded from any lesson file")
 
-    available_questions = {
-        qid: q
-        for qid, q in all_questions.items()
-        if qid not in user_question_history[user_id]
-    }
-    
-    if len(available_questions) < num_questions:
+    masks = [
+        history.available_mask(user_id, lid, len(questions), signature)
+        for lid, questions, signature in zip(lesson_ids, lessons, signatures)
+    ]
+
+    if sum(int(np.count_nonzero(mask)) for mask in masks) < num_questions:
         logging.info(
             f"Resetting question history for user {user_id} due to insufficient questions"
         )
-        current_lesson_ids = set(all_questions.keys())
-        user_question_history[user_id] = [
-            qid
-            for qid in user_question_history[user_id]
-            if qid not in current_lesson_ids
-        ]
-        available_questions = all_questions
-
-    total_questions = sum(lesson_question_counts.values())
-    questions_per_lesson = {
-        lesson: int(round(count / total_questions * num_questions))
-        for lesson, count in lesson_question_counts.items()
-    }
+        for i, (lid, questions, signature) in enumerate(zip(lesson_ids, lessons, signatures)):
+            history.reset(user_id, lid, len(questions), signature)
+            masks[i] = np.ones(len(questions), dtype=bool)
+
+    picks = select_questions(
+        lessons,
+        masks,
+        num_questions,
+        dedupe_key=bank.dedupe_key,
+    )
 
-    total_selected = sum(questions_per_lesson.values())
-    if total_selected < num_questions:
-        questions_per_lesson[
-            max(questions_per_lesson, key=questions_per_lesson.get)
-        ] += num_questions - total_selected
-    elif total_selected > num_questions:
-        questions_per_lesson[
-            max(questions_per_lesson, key=questions_per_lesson.get)
-        ] -= total_selected - num_questions
-
-    selected_questions = []
-    for lesson, count in questions_per_lesson.items():
-        lesson_questions = [
-            q for q in available_questions.values() 
-            if q["lesson"] == lesson
-        ]
-        selected = random.sample(lesson_questions, min(count, len(lesson_questions)))
-        selected_questions.extend(selected)
-
-    selected_questions = remove_duplicates_and_replace(selected_questions, available_questions)
-    
-    random.shuffle(selected_questions)
-    
-    user_question_history[user_id].extend(q["l-id"] for q in selected_questions)
+    used_by_lesson = {}
+    exam_questions = []
+    for lesson, position in picks:
+        used_by_lesson.setdefault(lesson, []).append(position)
+        # Bank entries are shared and read-only; the exam keeps its own option order
+        question = dict(lessons[lesson][position])
+        question["perm"] = random_option_permutation(question)
+        question["lesson"] = lesson_numbers[lesson]
+        question["l-id"] = f"L{lesson_numbers[lesson]}Q{position + 1}"
+        exam_questions.append(question)
 
-    valid_questions = [
-        q for q in selected_questions
-        if isinstance(q.get("options"), dict) and len(q["options"]) == 4
-    ]
+    for lesson, used in used_by_lesson.items():
+        history.mark_used(user_id, lesson_ids[lesson], used, len(lessons[lesson]), signatures[lesson])
 
-    return valid_questions
+    return exam_questions
 
 
-def generate_performance_analysis(results, lessons, is_class10):
+def generate_performance_analysis(results, lessons, is_class10, lesson_analytics=None):
     """
-    Generate a performance analysis based on exam results and lessons.
+    Generate a performance analysis based on exam results and lessons; errors
+    are raised to the caller. The prompt carries a per-lesson summary (lesson_analytics, as computed by
+    calculate_lesson_analytics) and only the incorrect answers, within
+    ANALYSIS_PROMPT_TOKENS estimated tokens.
     """
-    lessons_file = "lessons10.json" if is_class10 else "lessons.json"
-    with open(os.path.join("backend/data", lessons_file), "r") as f:
-        all_lessons = json.load(f)
-
     lesson_names = []
     for lesson in lessons:
-        for subject, subject_lessons in all_lessons.items():
-            if lesson in subject_lessons:
-                lesson_names.append(f"{subject}: {lesson}")
-                break
+        subject = lesson_catalog.subject_for_lesson(lesson, is_class10)
+        if subject:
+            lesson_names.append(f"{subject}: {lesson}")
 
     total_questions = len(results)
     correct_answers = sum(1 for r in results if r["is_correct"])
-    percentage = (correct_answers / total_questions) * 100
-    
-    result = ""
-    for r in results:
-        result += f"Question: {r['question']}\n"
-        result += f"Correct Answer: {r['correct_answer']}\n"
-        result += f"Student's Answer: {r['selected_answer']}\n"
-        result += f"Is Correct: {r['is_correct']}\n"
-        if "solution" in r:
-            result += f"Solution: {r['solution']}\n"
-        result += "\n"
+    percentage = (correct_answers / total_questions) * 100 if total_questions else 0
+
+    result = build_results_summary(
+        results,
+        lesson_analytics,
+        token_budget=int(os.getenv("ANALYSIS_PROMPT_TOKENS", "1500")),
+        max_item_chars=int(os.getenv("ANALYSIS_ITEM_CHARS", "200")),
+        lessons=lessons,
+    )
 
     prompt = PERFORMANCE_ANALYSIS_PROMPT.format(
         correct_answers=correct_answers,
@@ -407,40 +370,35 @@ def generate_performance_analysis(results, lessons, is_class10):
         lesson_names=', '.join(lesson_names)
     )
 
-    try:
-        client, model_name, nothink_enabled = get_client_for_model("PERFORMANCE_ANALYSIS_MODELS")
-        logging.info(f"Generating performance analysis using {model_name}...")
-        
-        params = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are an experienced teacher providing constructive feedback on exam performance. Be specific, encouraging, and practical in your advice.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            "model": model_name,
-            "temperature": 0.7,
-            "max_tokens": 2048,
-            "stream": False,
-        }
+    provider, model_name, nothink_enabled = get_random_model("PERFORMANCE_ANALYSIS_MODELS")
+    logging.info(f"Generating performance analysis using {model_name}...")
+    
+    params = {
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are an experienced teacher providing constructive feedback on exam performance. Be specific, encouraging, and practical in your advice.",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "model": model_name,
+        "temperature": 0.7,
+        "max_tokens": 2048,
+        "stream": False,
+    }
 
-        if nothink_enabled:
-            params['extra_body'] = {
-                "extra_body":{
-                "google": {
-                    "thinking_config": {
-                        "thinking_budget": 0
-                    }
+    if nothink_enabled:
+        params['extra_body'] = {
+            "extra_body":{
+            "google": {
+                "thinking_config": {
+                    "thinking_budget": 0
                 }
             }
-            }
-        
-        chat_completion = client.chat.completions.create(**params)
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        logging.error(f"Error generating performance analysis: {e}")
-        return "Unable to generate performance analysis at this time."
+        }
+        }
+    
+    return llm_gateway.complete(provider, get_provider_config(provider), params, purpose="PERFORMANCE_ANALYSIS_MODELS")
 
 
 def analyze_files(file_paths):
@@ -452,7 +410,7 @@ def analyze_files(file_paths):
     Streams progress/events identical to analyze_images.
     """
     try:
-        client, model_name, nothink_enabled = get_client_for_model("IMAGE_MODELS")
+        provider, model_name, nothink_enabled = get_random_model("IMAGE_MODELS")
 
         aggregated_texts = []
         upload_folder = os.path.dirname(file_paths[0]) if file_paths else os.getcwd()
@@ -523,7 +481,7 @@ def analyze_files(file_paths):
                 }
             }
 
-        chat_completion = client.chat.completions.create(**params)
+        chat_completion = llm_gateway.stream(provider, get_provider_config(provider), params, purpose="IMAGE_MODELS")
 
         full_response = ""
         question_list = []
@@ -533,9 +491,8 @@ def analyze_files(file_paths):
 
         logging.info("Starting to process streaming response...")
 
-        for chunk in chat_completion:
-            if chunk.choices[0].delta.content:
-                chunk_content = chunk.choices[0].delta.content
+        for chunk_content in chat_completion:
+            if chunk_content:
                 full_response += chunk_content
                 response_buffer += chunk_content
         
@@ -4,6 +4,7 @@ try:
     import json
     import os
     import random
+    import secrets
     import time
     import traceback
     from datetime import datetime, timedelta
@@ -23,18 +24,34 @@ try:
         user_repo,
         exam_repo,
         test_repo,
+        question_history_repo,
+        hint_cache_repo,
+        solution_cache_repo,
         leaderboard_service,
         convert_objectid_to_str,
         preload_caches,
     )
 
     import threading
-    from utils.lesson_utils import lesson2filepath, get_all_lessons_for_subject, get_all_subjects
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.lesson_utils import lesson_catalog, get_all_lessons_for_subject, get_all_subjects
     from utils.data_utils import load_json_file, calculate_lesson_analytics, decode_unicode
+    from utils.generate_utils import render_question, render_exam_questions
+    from utils.exam_hydration import (
+        ExamHydrationError,
+        compact_exam_question,
+        test_question_refs,
+        load_exam_questions,
+    )
     from utils.name_utils import generate_memorable_name
     from utils.auth_utils import get_student_class, get_current_user_info
     from utils.job_utils import allowed_file, cleanup_old_files, delete_unsubmitted_exams
     from utils.parse_files import render_pdf_previews, render_pptx_previews
+    from utils.question_bank import question_bank, content_hash
+    from utils.model_router import model_router
+    from utils.llm_gateway import llm_gateway
+    from utils.llm_metrics import llm_metrics
+    from utils.key_pool import key_pools
 
 except ImportError as e:
     print(f"Import Error: {str(e)}")
@@ -56,6 +73,20 @@ data_path = os.path.join(current_dir, "data")
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                             os.getenv('UPLOAD_FOLDER', 'uploads'))
 ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'png,jpg,jpeg').split(','))
+# Background workers generating performance analyses after exam submission
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))
+# Seconds after which a still-pending analysis (e.g. lost in a restart) is queued again when polled
+ANALYSIS_RETRY_AFTER = int(os.getenv('ANALYSIS_RETRY_AFTER', '180'))
+# Seconds between checks for changed lesson files (question bank and catalog hot reload)
+CONTENT_RELOAD_INTERVAL = int(os.getenv('CONTENT_RELOAD_INTERVAL', '30'))
+# Race a second model when the first is slow to start a hint or solution stream
+HEDGE_INTERACTIVE = os.getenv('LLM_HEDGE_INTERACTIVE', 'false').lower() == 'true'
+# Let simultaneous identical hint/solution requests share one model stream
+COALESCE_INTERACTIVE = os.getenv('LLM_COALESCE_INTERACTIVE', 'false').lower() == 'true'
+# Generate explanations for wrong answers in the background right after submission
+SOLUTION_PREFETCH = os.getenv('SOLUTION_PREFETCH', 'false').lower() == 'true'
+SOLUTION_PREFETCH_WORKERS = int(os.getenv('SOLUTION_PREFETCH_WORKERS', '2'))
+SOLUTION_PREFETCH_PER_USER = int(os.getenv('SOLUTION_PREFETCH_PER_USER', '10'))
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
@@ -87,6 +118,18 @@ class10_student_info = json.loads(open(os.path.join(data_path, "class10_students
 
 UPDATE_LOGS = json.loads(open(os.path.join(data_path, "Update.json")).read())
 
+# Load every lesson's questions once; exam creation then samples from memory
+question_bank.load()
+
+# Performance analyses run here so submit_exam can return right after grading
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+analysis_jobs = set()
+analysis_lock = threading.Lock()
+# Few workers, and their streams run in the gateway's background slots (LLM_BACKGROUND_CONCURRENCY)
+prefetch_executor = ThreadPoolExecutor(max_workers=SOLUTION_PREFETCH_WORKERS, thread_name_prefix="solution-prefetch")
+prefetch_counts = {}
+prefetch_lock = threading.Lock()
+
 
 @app.route("/api/login", methods=["POST"])
 def login():
@@ -194,14 +237,10 @@ def get_lessons():
     if not subject:
         return jsonify({"message": "Subject parameter is required"}), 400
 
-    lessons_file = "lessons10.json" if is_class10 else "lessons.json"
-    with open(os.path.join(data_path, lessons_file)) as f:
-        lessons = json.load(f)
-
-    if subject not in lessons:
+    if not lesson_catalog.has_subject(subject, is_class10):
         return jsonify({"message": "Invalid subject"}), 400
 
-    return jsonify(lessons[subject]), 200
+    return jsonify(lesson_catalog.lessons_for(subject, is_class10)), 200
 
 
 @app.route("/api/create_exam", methods=["POST"])
@@ -222,7 +261,8 @@ def create_exam():
         exam_id = f"{test_id}-{current_user}"
         subject = test_data["subject"]
         lessons = test_data.get("lessons", [])
-        questions = test_data.get("questions", [])
+        # Every student sees the test's questions; store references to them
+        questions = test_question_refs(len(test_data.get("questions", [])))
 
     else:
         subject = data.get("subject")
@@ -231,7 +271,7 @@ def create_exam():
             return jsonify({"message": "Subject and lessons are required"}), 400
 
         lesson_paths = [
-            lesson2filepath(subject, lesson, class10=is_class10) for lesson in lessons
+            lesson_catalog.lesson_path(subject, lesson, class10=is_class10) for lesson in lessons
         ]
         if not lesson_paths:
             return jsonify({"message": "Invalid lessons provided"}), 400
@@ -239,11 +279,12 @@ def create_exam():
         exam_id = generate_memorable_name()
         try:
             questions = generate.generate_exam_questions(
-                subject, lesson_paths, current_user
+                subject, lesson_paths, current_user, question_history_repo
             )
         except Exception as e:
             print(f"Error generating questions: {e}")
             return jsonify({"message": f"Error generating questions: {str(e)}"}), 500
+        questions = [compact_exam_question(q) for q in questions]
 
     exam_data = {
         "exam-id": exam_id,
@@ -259,6 +300,7 @@ def create_exam():
         "test": is_test,
     }
     if is_test:
+        exam_data["test-id"] = test_id
         exam_data["test_name"] = test_data.get("test_name")
 
     try:
@@ -272,6 +314,11 @@ def create_exam():
         return jsonify({"message": f"Error creating exam: {str(e)}"}), 500
 
 
+def get_exam_questions(exam, is_class10):
+    """Full questions of a stored exam (compact references are resolved)."""
+    return load_exam_questions(exam, question_bank.snapshot(), test_repo, is_class10)
+
+
 @app.route("/api/submit_exam/<exam_id>", methods=["POST"])
 @jwt_required()
 def submit_exam(exam_id):
@@ -289,7 +336,15 @@ def submit_exam(exam_id):
     if exam["userId"] != current_user:
         return jsonify({"message": "Unauthorized"}), 401
 
-    total_questions = len(exam["questions"])
+    try:
+        full_questions = get_exam_questions(exam, is_class10)
+    except ExamHydrationError as e:
+        print(f"Error loading exam questions: {e}")
+        return jsonify({"message": str(e)}), 500
+
+    # Answers refer to the options in the order the student saw them
+    questions = render_exam_questions(full_questions)
+    total_questions = len(questions)
     score = 0
 
     # Prepare questions that need solutions
@@ -297,7 +352,7 @@ def submit_exam(exam_id):
     initial_results = []
 
     for i, (question, selected_answer) in enumerate(
-        zip(exam["questions"], selected_answers), 1
+        zip(questions, selected_answers), 1
     ):
         correct_answer = question.get("answer")
         is_correct = selected_answer["option"] == correct_answer
@@ -308,6 +363,7 @@ def submit_exam(exam_id):
 
         result = {
             "question-no": str(i),
+            "qid": question.get("qid"),
             "question": question["question"],
             "is_correct": is_correct,
             "selected_answer": f"{selected_answer['option']}) {selected_option_value}",
@@ -331,17 +387,7 @@ def submit_exam(exam_id):
     percentage = (score / total_questions) * 100 if total_questions else 0
 
     # Calculate lesson-wise analytics
-    lesson_analytics = calculate_lesson_analytics(exam["questions"], selected_answers)
-
-    # Generate performance analysis (non-critical)
-    try:
-        performance_analysis = generate.generate_performance_analysis(
-            initial_results, exam["lessons"], is_class10
-        )
-        perf_analysis = performance_analysis
-    except Exception as e:
-        print(f"Error generating performance analysis: {e}")
-        perf_analysis = None
+    lesson_analytics = calculate_lesson_analytics(questions, selected_answers)
 
     updated_data = {
         "is_submitted": True,
@@ -353,7 +399,10 @@ def submit_exam(exam_id):
         "lesson_analytics": lesson_analytics,
         "submission_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         "test": exam.get("test", False),
-        "performance_analysis": perf_analysis,
+        # Filled in by a background job; see /api/performance_analysis/<exam_id>
+        "performance_analysis": None,
+        "performance_analysis_status": "pending",
+        "performance_analysis_queued_at": time.time(),
         "questions_needing_solutions": [q["index"] for q in questions_needing_solutions],
     }
     if updated_data.get("test"):
@@ -374,6 +423,12 @@ def submit_exam(exam_id):
 
     # Persist exam update
     if exam_repo.update_exam(exam_id, updated_data, is_class10):
+        queue_performance_analysis(exam_id, initial_results, exam["lessons"], is_class10, lesson_analytics)
+        if SOLUTION_PREFETCH:
+            queue_solution_prefetch(
+                current_user, exam_id, full_questions, questions_needing_solutions, is_class10
+            )
+
         # Update user stats in user-centric model
         try:
             user_stats, subject_stats = user_repo.update_stats_after_exam(
@@ -416,6 +471,7 @@ def submit_exam(exam_id):
                 "percentage": percentage,
                 "results": initial_results,
                 "questions_needing_solutions": [q["index"] for q in questions_needing_solutions],
+                "performance_analysis_status": "pending",
                 "completed_tasks": completed_tasks
             }
         ), 200
@@ -423,6 +479,123 @@ def submit_exam(exam_id):
         return jsonify({"message": "Failed to submit exam"}), 500
 
 
+def queue_performance_analysis(exam_id, results, lessons, is_class10, lesson_analytics=None):
+    """Start the analysis job for an exam unless this process is already running one."""
+    with analysis_lock:
+        if exam_id in analysis_jobs:
+            return
+        analysis_jobs.add(exam_id)
+    analysis_executor.submit(run_performance_analysis, exam_id, results, lessons, is_class10, lesson_analytics)
+
+
+def run_performance_analysis(exam_id, results, lessons, is_class10, lesson_analytics=None):
+    """Background job: generate the performance analysis and store it on the exam."""
+    try:
+        analysis = generate.generate_performance_analysis(results, lessons, is_class10, lesson_analytics)
+        if not (analysis or "").strip():
+            raise ValueError("empty response")
+        update = {"performance_analysis": analysis, "performance_analysis_status": "done"}
+    except Exception as e:
+        print(f"Error generating performance analysis: {e}")
+        update = {"performance_analysis": None, "performance_analysis_status": "failed"}
+    finally:
+        with analysis_lock:
+            analysis_jobs.discard(exam_id)
+    exam_repo.update_exam(exam_id, update, is_class10)
+
+
+def solution_request(question, correct_answer_text, selected_answer_text):
+    """
+    Prompt inputs and cache keys for explaining a wrong answer. `question` is
+    the stored (unshuffled) exam question, so everyone making the same mistake
+    produces the same prompt and shares the explanation.
+    """
+    question_key = question.get("qid") or content_hash(question["question"])
+    return {
+        "question": question["question"],
+        "correct_answer": correct_answer_text,
+        "given_answer": selected_answer_text,
+        # Option texts only: students see different option letters
+        "options": list(question["options"].values()),
+        "question_key": question_key,
+        "cache_key": solution_cache_repo.key_for(question_key, correct_answer_text, selected_answer_text),
+    }
+
+
+def queue_solution_prefetch(user_id, exam_id, full_questions, wrong_answers, is_class10):
+    """Queue background explanations for a submission's wrong answers, up to the user's limit."""
+    with prefetch_lock:
+        free = SOLUTION_PREFETCH_PER_USER - prefetch_counts.get(user_id, 0)
+        wrong_answers = wrong_answers[:max(free, 0)]
+        if wrong_answers:
+            prefetch_counts[user_id] = prefetch_counts.get(user_id, 0) + len(wrong_answers)
+    for item in wrong_answers:
+        request_data = solution_request(
+            full_questions[item["index"]], item["correct_answer"], item["given_answer"]
+        )
+        prefetch_executor.submit(
+            prefetch_solution, user_id, exam_id, item["index"], request_data, is_class10
+        )
+
+
+def prefetch_solution(user_id, exam_id, question_index, request_data, is_class10):
+    """
+    Background job: explain one wrong answer and store it on the exam. Runs as
+    a coalesced stream, so a student who opens the solution meanwhile attaches
+    to it instead of starting another generation.
+    """
+    standard = 10 if is_class10 else 9
+    try:
+        solution = solution_cache_repo.get(request_data["cache_key"], standard)
+        if not solution:
+            solution = "".join(generate.stream_solution(
+                request_data["question"],
+                request_data["correct_answer"],
+                request_data["given_answer"],
+                request_data["options"],
+                coalesce=True,
+                scope=str(standard),
+                background=True,
+                on_complete=lambda text: text.strip() and solution_cache_repo.put(
+                    request_data["cache_key"], text, standard, question_key=request_data["question_key"]
+                ),
+            ))
+        if solution.strip():
+            exam_repo.update_exam_solution(exam_id, question_index, solution, is_class10)
+    except Exception as e:
+        print(f"Error prefetching solution for exam {exam_id} question {question_index}: {e}")
+    finally:
+        with prefetch_lock:
+            prefetch_counts[user_id] -= 1
+            if not prefetch_counts[user_id]:
+                del prefetch_counts[user_id]
+
+
+@app.route("/api/performance_analysis/<exam_id>", methods=["GET"])
+@jwt_required()
+def get_performance_analysis_route(exam_id):
+    """Poll the status ("pending", "done" or "failed") and result of an exam's analysis."""
+    current_user, is_class10 = get_current_user_info()
+    exam = exam_repo.get_exam(exam_id, is_class10)
+    if not exam:
+        return jsonify({"message": "Exam not found"}), 404
+    if exam["userId"] != current_user:
+        return jsonify({"message": "Unauthorized access to exam"}), 401
+    if not exam.get("is_submitted", False):
+        return jsonify({"message": "Exam has not been submitted"}), 400
+
+    analysis = exam.get("performance_analysis")
+    # Exams submitted before analyses ran in the background have no status
+    status = exam.get("performance_analysis_status") or ("done" if analysis else "failed")
+    if status == "pending" and time.time() - exam.get("performance_analysis_queued_at", 0) > ANALYSIS_RETRY_AFTER:
+        # The job was lost (server restart) or is stuck; run it again
+        exam_repo.update_exam(exam_id, {"performance_analysis_queued_at": time.time()}, is_class10)
+        queue_performance_analysis(
+            exam_id, exam.get("results", []), exam.get("lessons", []), is_class10, exam.get("lesson_analytics")
+        )
+    return jsonify({"status": status, "performance_analysis": analysis}), 200
+
+
 def check_and_update_tasks(user_id, is_class10, exam_data):
     user = user_repo.get_user(user_id, is_class10)
     if not user or "tasks" not in user or "tasks_list" not in user["tasks"]:
@@ -479,6 +652,7 @@ def check_and_update_tasks(user_id, is_class10, exam_data):
 @jwt_required()
 def generate_hint_route():
     """Generate a hint for a given question without revealing the answer."""
+    _, is_class10 = get_current_user_info()
     data = request.get_json()
     question_text = data.get("question")
 
@@ -488,7 +662,13 @@ def generate_hint_route():
     try:
         # Return a streaming response
         return Response(
-            generate.generate_hint(question_text),
+            generate.generate_hint(
+                question_text,
+                hint_cache=hint_cache_repo,
+                standard=10 if is_class10 else 9,
+                hedge=HEDGE_INTERACTIVE,
+                coalesce=COALESCE_INTERACTIVE,
+            ),
             mimetype='text/event-stream',
             headers={'Cache-Control': 'no-cache'}
         )
@@ -527,6 +707,15 @@ def generate_solution_route():
         return jsonify({"message": "Invalid question index or exam has no results"}), 400
 
     result = exam["results"][question_index]
+
+    # Already on the exam (e.g. prefetched after submission); no need to load the questions
+    if result.get("solution"):
+        return Response(
+            iter([result["solution"]]),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache'}
+        )
+
     question_text = result["question"]
 
     correct_answer = result["correct_answer"]
@@ -535,9 +724,15 @@ def generate_solution_route():
     correct_answer_text = correct_answer.split(") ", 1)[1] if ") " in correct_answer else correct_answer
     selected_answer_text = selected_answer.split(") ", 1)[1] if ") " in selected_answer else selected_answer
 
+    try:
+        questions = get_exam_questions(exam, is_class10)
+    except ExamHydrationError as e:
+        print(f"Error loading exam questions: {e}")
+        return jsonify({"message": str(e)}), 500
+
     # Find original question to get options
     original_question = None
-    for i, q in enumerate(exam["questions"]):
+    for i, q in enumerate(questions):
         if q["question"] == question_text:
             original_question = q
             break
@@ -545,19 +740,51 @@ def generate_solution_route():
     if not original_question:
         return jsonify({"message": "Question not found in exam"}), 404
 
-    options = original_question["options"]
+    request_data = solution_request(original_question, correct_answer_text, selected_answer_text)
+    options = request_data["options"]
+    standard = 10 if is_class10 else 9
+    question_key = request_data["question_key"]
+    cache_key = request_data["cache_key"]
+
+    cached_solution = solution_cache_repo.get(cache_key, standard)
+    if cached_solution:
+        try:
+            exam_repo.update_exam_solution(exam_id, question_index, cached_solution, is_class10)
+        except Exception as e:
+            print(f"Error saving solution to database: {e}")
+        return Response(
+            iter([cached_solution]),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache'}
+        )
+
+    def cache_solution(solution):
+        if solution.strip():
+            solution_cache_repo.put(cache_key, solution, standard, question_key=question_key)
 
     try:
         def generate_and_save():
             full_solution = ""
-            for chunk in generate.generate_solution_stream(
-                question_text,
-                correct_answer_text,
-                selected_answer_text,
-                options
-            ):
-                full_solution += chunk
-                yield chunk
+            try:
+                for chunk in generate.stream_solution(
+                    question_text,
+                    correct_answer_text,
+                    selected_answer_text,
+                    options,
+                    hedge=HEDGE_INTERACTIVE,
+                    # A running prefetch for this answer is only joined through coalescing
+                    coalesce=COALESCE_INTERACTIVE or SOLUTION_PREFETCH,
+                    scope=str(standard),
+                    on_complete=cache_solution,
+                ):
+                    full_solution += chunk
+                    yield chunk
+            except Exception as e:
+                print(f"Error generating solution: {e}")
+                yield f"Unable to generate solution: {str(e)}"
+                return
+            if not full_solution.strip():
+                return
             try:
                 exam_repo.update_exam_solution(exam_id, question_index, full_solution, is_class10)
             except Exception as e:
@@ -581,6 +808,12 @@ def get_exam_route(exam_id):
 
     if exam_data:
         response_data = copy.deepcopy(exam_data)
+        try:
+            questions = get_exam_questions(exam_data, is_class10)
+        except ExamHydrationError as e:
+            print(f"Error loading exam questions: {e}")
+            return jsonify({"message": str(e)}), 500
+        response_data["questions"] = render_exam_questions(questions)
         if not response_data.get("is_submitted", False):
             for question in response_data["questions"]:
                 question.pop("answer", None)
@@ -625,7 +858,7 @@ def report_question():
         if question_index >= len(exam.get("questions", [])):
             return jsonify({"message": "Invalid question index"}), 400
 
-        question_data = exam["questions"][question_index]
+        question_data = render_question(get_exam_questions(exam, is_class10)[question_index])
 
         # Updated path to use data folder
         reports_file = os.path.join(data_path, "reports", "question_reports.json")
@@ -652,6 +885,7 @@ def report_question():
             "class10": is_class10,
             "exam_id": exam_id,
             "question_index": question_index,
+            "qid": question_data.get("qid"),
             "question_data": question_data,
             "reason": reason,
             "description": description,
@@ -744,12 +978,8 @@ def get_tests():
         }
 
         if not (9 in teacher_standards and 10 in teacher_standards):
-            lessons_file = "lessons10.json" if is_class10 else "lessons.json"
-            lessons_data = load_json_file(lessons_file)
-            response_data["subject_lessons"] = (
-                lessons_data.get(teacher_info.get("subject"), [])
-                if lessons_data
-                else []
+            response_data["subject_lessons"] = lesson_catalog.lessons_for(
+                teacher_info.get("subject"), is_class10
             )
 
         response.update(response_data)
@@ -777,22 +1007,25 @@ def generate_test():
     questions = []
     if lessons:
         lesson_paths = [
-            lesson2filepath(subject, lesson, class10=class10) for lesson in lessons
+            lesson_catalog.lesson_path(subject, lesson, class10=class10) for lesson in lessons
         ]
 
         if None in lesson_paths:
             pass
         else:
             try:
-                questions = generate.generate_exam_questions(subject, lesson_paths, current_user)
+                questions = generate.generate_exam_questions(
+                    subject, lesson_paths, current_user, question_history_repo
+                )
             except Exception as e:
                 print(f"Error generating questions: {e}")
                 return jsonify({"message": f"Error generating questions: {str(e)}"}), 500
 
     formatted_questions = []
-    for q in questions:
+    for q in render_exam_questions(questions):
         formatted_questions.append(
             {
+                "qid": q.get("qid"),
                 "question": q["question"],
                 "options": q["options"],
                 "answer": q["answer"],
@@ -839,7 +1072,11 @@ def create_test():
             return jsonify({"message": "Invalid options format"}), 400
 
     random.shuffle(questions)
-    test_id = f"TS-{subject}-{str(random.randint(100,999))}"
+    # Exams find their test by ID long after it expires, so an ID is never reused
+    while True:
+        test_id = f"TS-{subject}-{secrets.token_hex(4)}"
+        if not test_repo.get_test(test_id, class10, include_inactive=True):
+            break
 
     test_data = {
         "test-id": test_id,
@@ -934,6 +1171,36 @@ def get_students_by_standard_route():
         return jsonify({"message": f"Error fetching students: {str(e)}"}), 500
 
 
+@app.route("/api/admin/model_routing", methods=["GET"])
+@jwt_required()
+def get_model_routing():
+    """
+    Per-model latency/error figures, circuit states, recent routing decisions,
+    hedging and coalescing counters, and the state of each provider's API keys.
+    """
+    current_user, _ = get_current_user_info()
+    teachers_data = load_json_file("teachers.json")
+    if not teachers_data or current_user not in teachers_data:
+        return jsonify({"message": "Unauthorized access"}), 401
+    return jsonify(dict(
+        model_router.snapshot(),
+        hedging=llm_gateway.hedging.as_dict(),
+        coalescing=llm_gateway.coalescing.as_dict(),
+        key_pools=key_pools.snapshot(),
+    )), 200
+
+
+@app.route("/api/admin/llm_metrics", methods=["GET"])
+@jwt_required()
+def get_llm_metrics():
+    """Token, latency, retry and error figures for LLM calls by model list, provider and model."""
+    current_user, _ = get_current_user_info()
+    teachers_data = load_json_file("teachers.json")
+    if not teachers_data or current_user not in teachers_data:
+        return jsonify({"message": "Unauthorized access"}), 401
+    return jsonify(llm_metrics.snapshot()), 200
+
+
 @app.route("/api/leaderboard", methods=["GET"])
 @jwt_required()
 def get_leaderboard():
@@ -1383,6 +1650,17 @@ def start_unsubmitted_exams_scheduler():
         time.sleep(86400)
 
 
+def start_content_reload_scheduler():
+    """Periodically swaps in new lesson content (question bank and lesson catalog)."""
+    while True:
+        time.sleep(CONTENT_RELOAD_INTERVAL)
+        try:
+            lesson_catalog.refresh()
+            question_bank.reload_if_changed()
+        except Exception as e:
+            print(f"Error in content reload scheduler: {e}")
+
+
 @app.route("/api/unsubmitted_exams", methods=["GET"])
 @jwt_required()
 def get_unsubmitted_exams_route():
@@ -1478,6 +1756,9 @@ expiration_thread.start()
 unsubmitted_exams_thread = threading.Thread(target=start_unsubmitted_exams_scheduler, daemon=True)
 unsubmitted_exams_thread.start()
 
+content_reload_thread = threading.Thread(target=start_content_reload_scheduler, daemon=True)
+content_reload_thread.start()
+
 if __name__ == "__main__":
     print("Preloading caches before starting server...")
     preload_caches()
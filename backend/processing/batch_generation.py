@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import RateLimitError
+
+from utils.key_pool import retry_after_seconds
+
+
+class RateLimitGate:
+    """
+    Shared back-off for all workers: after a 429 every worker pauses until the
+    provider's Retry-After (or an exponentially growing delay) has passed.
+    Successful calls shrink the delay again.
+    """
+
+    def __init__(self, base_delay=5.0, max_delay=300.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._delay = base_delay
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                remaining = self._resume_at - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def limited(self, error):
+        retry_after = retry_after_seconds(error)
+        with self._lock:
+            delay = retry_after if retry_after is not None else self._delay
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            self._delay = min(self._delay * 2, self.max_delay)
+        print(f"  rate limited, pausing all workers for {delay:.0f}s")
+
+    def succeeded(self):
+        with self._lock:
+            self._delay = max(self.base_delay, self._delay / 2)
+
+
+def generate_with_retries(produce, gate, retries=5):
+    """
+    Text from produce(), retried on errors and empty output. Rate limits pause
+    every worker through `gate` and do not count as failed attempts.
+    """
+    for attempt in range(retries):
+        gate.wait()
+        try:
+            text = produce()
+            if not text.strip():
+                raise ValueError("empty response")
+            gate.succeeded()
+            return text
+        except RateLimitError as e:
+            gate.limited(e)
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            print(f"  retrying after error: {e}")
+            time.sleep(2 ** attempt)
+    raise RuntimeError("rate limited on every attempt")
+
+
+def run_batch(items, produce, store, flush, noun, workers=4, checkpoint_every=50):
+    """
+    Run produce(job) for every (key, job) in `items` on `workers` threads and
+    store(key, job, text) each result. At most twice `workers` jobs are queued
+    at a time, and flush() runs every `checkpoint_every` results, on Ctrl+C and
+    at the end, so an interrupted run keeps what it finished.
+    """
+    gate = RateLimitGate()
+    slots = threading.BoundedSemaphore(workers * 2)
+    counts = {"done": 0, "failed": 0}
+    counts_lock = threading.Lock()
+
+    def finished(future, key, job):
+        if future.cancelled():
+            slots.release()
+            return
+        try:
+            store(key, job, future.result())
+            failed = False
+        except Exception as e:
+            print(f"Failed to generate {noun} for {key}: {e}")
+            failed = True
+        finally:
+            slots.release()
+        with counts_lock:
+            counts["failed" if failed else "done"] += 1
+            total = counts["done"] + counts["failed"]
+        if total % checkpoint_every == 0:
+            flush()
+            print(f"Progress: {total}/{len(items)} ({counts['failed']} failed)")
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for key, job in items:
+            slots.acquire()
+            future = executor.submit(generate_with_retries, lambda j=job: produce(j), gate)
+            future.add_done_callback(lambda f, k=key, j=job: finished(f, k, j))
+        executor.shutdown(wait=True)
+    except KeyboardInterrupt:
+        print(f"Interrupted, saving finished {noun}s...")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        flush()
+    print(f"Stored {counts['done']} {noun}s, {counts['failed']} failed")
+    return counts
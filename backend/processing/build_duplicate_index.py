@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from utils.duplicate_index import (
+    DUPLICATE_INDEX_FILENAME,
+    find_duplicate_clusters,
+    save_duplicate_index,
+)
+from utils.question_bank import load_lessons_from_disk
+
+
+def build_duplicate_index(threshold=0.7, bands=16):
+    """Cluster near-duplicate questions within each class and subject and save the index."""
+    data_dir = os.path.join(base_dir, "data")
+    lessons = load_lessons_from_disk(data_dir)
+
+    # Exams only mix lessons of one subject, so compare within (standard, subject)
+    by_subject = {}
+    for (standard, subject, _), questions in lessons.items():
+        by_subject.setdefault((standard, subject), []).extend(questions)
+
+    clusters = []
+    for (standard, subject), questions in sorted(by_subject.items()):
+        found = find_duplicate_clusters(questions, threshold=threshold, bands=bands)
+        clustered = sum(len(c) for c in found)
+        print(f"Class {standard} {subject}: {len(questions)} questions, {len(found)} clusters covering {clustered}")
+        clusters.extend(found)
+
+    out_path = os.path.join(data_dir, DUPLICATE_INDEX_FILENAME)
+    save_duplicate_index(clusters, out_path, threshold)
+    print(f"Saved {len(clusters)} duplicate clusters to {out_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the near-duplicate question index")
+    parser.add_argument("--threshold", type=float, default=0.7,
+                        help="Minimum estimated Jaccard similarity to treat two questions as duplicates")
+    parser.add_argument("--bands", type=int, default=16,
+                        help="Number of LSH bands (must divide the 64-value MinHash signature)")
+    args = parser.parse_args()
+    build_duplicate_index(threshold=args.threshold, bands=args.bands)
@@ -0,0 +1,38 @@
+import os
+import sys
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from utils.compiled_bank import COMPILED_BANK_FILENAME, MappedBank, compile_bank
+from utils.question_archive import QuestionArchive, superseded_questions
+from utils.question_bank import load_lessons_from_disk
+
+
+def compile_all_lesson_files():
+    """
+    Compile every lesson JSON under data/lessons and data/lessons10 into one
+    binary bank. Questions of the previous bank that were edited or removed
+    since are archived first, so exams that reference them still load.
+    """
+    data_dir = os.path.join(base_dir, "data")
+    out_path = os.path.join(data_dir, COMPILED_BANK_FILENAME)
+
+    lessons = load_lessons_from_disk(data_dir)
+    if os.path.exists(out_path):
+        try:
+            previous = MappedBank(out_path).lessons()
+        except (OSError, ValueError) as e:
+            print(f"Could not read the previous bank {out_path}, nothing archived: {e}")
+        else:
+            archive = QuestionArchive(data_dir)
+            archived = archive.add(superseded_questions(previous, lessons))
+            print(f"Archived {archived} edited or removed questions in {archive.path}")
+    lesson_count, question_count = compile_bank(lessons, out_path)
+
+    size_kb = os.path.getsize(out_path) / 1024
+    print(f"Compiled {question_count} questions from {lesson_count} lessons into {out_path} ({size_kb:.1f} KB)")
+
+
+if __name__ == '__main__':
+    compile_all_lesson_files()
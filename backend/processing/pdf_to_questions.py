@@ -1,11 +1,10 @@
 import os
 import json
-from openai import OpenAI, RateLimitError
+from openai import RateLimitError
 import logging
 import traceback
 from dotenv import load_dotenv
 import time
-import random
 import sys
 from pdf_prompts import (
     get_prompt as get_subject_prompt,
@@ -21,6 +20,11 @@ from typing import Dict, List, Tuple, Any
 from pdftext.extraction import plain_text_output
 # Get the script's directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+from utils.key_pool import key_pools, retry_after_seconds
+from utils.llm_clients import get_llm_client
+from utils.model_router import model_router
+from utils.llm_metrics import llm_metrics
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -89,13 +93,18 @@ def model_inference(mode, system_prompt, prompt, response_format=None, reasoning
     for retry in range(max_retry):
         if len(models_list) == 1:
             models_list = json.loads(models) #reset models_list
-        model_full_name = random.choice(models_list)
+        model_full_name = model_router.choose(models_list, purpose=mode)
         provider, model_name = model_full_name.split("/")
-        provider_config = get_config(provider)
-        client = OpenAI(api_key=provider_config["api_key"], base_url=provider_config["base_url"])
-        logger.info(f"Using model {model_full_name} for {mode} ATTEMPT - {retry+1}")
+        key_pool = key_pools.pool(provider, get_config(provider))
+        key, wait = key_pool.acquire()
+        client = get_llm_client(provider, {"api_key": key.api_key, "base_url": key.base_url})
+        logger.info(f"Using model {model_full_name} with {key.name} for {mode} ATTEMPT - {retry+1}")
         
         try:
+            if wait > 0:
+                # Every key is cooling down; this one is free soonest
+                logger.info(f"Waiting {wait:.1f}s for {key.name} to come off its rate limit")
+                time.sleep(wait)
             api_params = {
                 "model": model_name,
                 "messages": [
@@ -109,17 +118,31 @@ def model_inference(mode, system_prompt, prompt, response_format=None, reasoning
             if provider.lower() == "gemini":
                 if "2.5" in model_name:
                     api_params["reasoning_effort"] = reasoning_effort
-            response = client.chat.completions.create(**api_params)
-            if not response or not response.choices:
-                raise Exception("Invalid or empty response received from API")
+            started = time.monotonic()
+            try:
+                with llm_metrics.track(models_env_var, provider, model_name, retry=retry > 0) as call:
+                    response = client.chat.completions.create(**api_params)
+                    if not response or not response.choices:
+                        raise Exception("Invalid or empty response received from API")
+                    call.usage(response.usage)
+            except RateLimitError:
+                raise  # a key problem, not the model's; handled below
+            except Exception as e:
+                model_router.record_failure(model_full_name, e)
+                raise
             content = response.choices[0].message.content
+            model_router.record_success(model_full_name, time.monotonic() - started, output_chars=len(content or ""))
+            key_pool.succeeded(key)
             if response_format and response_format == "json_object":
                 cleaned_content = content.replace("```json", "").replace("```", "").strip()
                 return json.loads(cleaned_content), model_full_name
             else:
                 return content, model_full_name
         except RateLimitError as e:
-            logging.error(f"Rate limit exceeded for model {model_full_name}. Error: {e}")
+            logging.error(f"Rate limit exceeded for model {model_full_name} on {key.name}. Error: {e}")
+            key_pool.rate_limited(key, retry_after_seconds(e))
+            if key_pool.has_ready_key():
+                continue  # another key of this provider can take the request
             time.sleep(60)
             if len(models_list) > 1:
                 models_list.remove(model_full_name)
@@ -132,6 +155,8 @@ def model_inference(mode, system_prompt, prompt, response_format=None, reasoning
                 models_list.remove(model_full_name)
             if retry == max_retry - 1:
                 raise Exception(f"Max retries exceeded for model {model_full_name}. Last error: {e}")
+        finally:
+            key_pool.release(key)
 
     raise Exception("Max retries exceeded without a successful response.")
 
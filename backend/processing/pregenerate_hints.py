@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+import generate
+from db import hint_cache_repo
+from utils.question_bank import content_hash, question_bank
+from batch_generation import run_batch
+
+
+def collect_missing_hints(standards, limit=None):
+    """Unique question texts per (standard, content hash) that have no cached hint yet."""
+    bank = question_bank.snapshot()
+    pending = {}
+    for standard in standards:
+        cached = hint_cache_repo.cached_hashes(standard)
+        for (lesson_standard, _, _), questions in sorted(bank.lessons.items()):
+            if lesson_standard != standard:
+                continue
+            for q in questions:
+                key = content_hash(q["question"])
+                if key not in cached and (standard, key) not in pending:
+                    pending[(standard, key)] = q["question"]
+    items = sorted(pending.items())
+    return items[:limit] if limit else items
+
+
+def pregenerate_hints(standards, workers=4, limit=None, checkpoint_every=25):
+    """
+    Generate and store hints for every bank question that lacks one. Hints are
+    saved as they complete and flushed to the DB every `checkpoint_every`
+    hints, so an interrupted run resumes where it stopped.
+    """
+    items = collect_missing_hints(standards, limit)
+    print(f"{len(items)} questions need hints")
+    if not items:
+        return
+
+    run_batch(
+        items,
+        produce=lambda text: "".join(generate.stream_hint(text)),
+        store=lambda key, text, hint: hint_cache_repo.put(key[1], hint, key[0]),
+        flush=hint_cache_repo.flush,
+        noun="hint",
+        workers=workers,
+        checkpoint_every=checkpoint_every,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-generate hints for every question in the bank")
+    parser.add_argument("--standard", type=int, choices=[9, 10],
+                        help="Only this class (default: both)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent hint generations")
+    parser.add_argument("--limit", type=int,
+                        help="Stop after this many questions")
+    args = parser.parse_args()
+    standards = [args.standard] if args.standard else [9, 10]
+    pregenerate_hints(standards, workers=args.workers, limit=args.limit)
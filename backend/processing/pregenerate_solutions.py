@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+import generate
+from db import solution_cache_repo
+from utils.question_bank import question_bank
+from batch_generation import run_batch
+
+
+def collect_missing_solutions(standards, limit=None):
+    """
+    One job per (question, wrong option) without a stored explanation, keyed
+    the same way /api/generate_solution looks them up.
+    """
+    bank = question_bank.snapshot()
+    jobs = {}
+    for standard in standards:
+        cached = solution_cache_repo.cached_keys(standard)
+        for (lesson_standard, _, _), questions in sorted(bank.lessons.items()):
+            if lesson_standard != standard:
+                continue
+            for q in questions:
+                correct = q["options"][q["answer"]]
+                for key, chosen in q["options"].items():
+                    if key == q["answer"]:
+                        continue
+                    cache_key = solution_cache_repo.key_for(q["qid"], correct, chosen)
+                    if cache_key in cached or (standard, cache_key) in jobs:
+                        continue
+                    jobs[(standard, cache_key)] = {
+                        "qid": q["qid"],
+                        "question": q["question"],
+                        "correct_answer": correct,
+                        "given_answer": chosen,
+                        # Same prompt input as the live route: option texts, no letters
+                        "options": list(q["options"].values()),
+                    }
+    items = list(jobs.items())
+    return items[:limit] if limit else items
+
+
+def pregenerate_solutions(standards, workers=4, limit=None, checkpoint_every=50):
+    """
+    Generate and store explanations for every wrong option in the bank.
+    At most `workers` requests are in flight and at most twice that many jobs
+    are queued. Results are flushed to the DB every `checkpoint_every`
+    solutions, and existing ones are skipped, so the run can be resumed.
+    """
+    items = collect_missing_solutions(standards, limit)
+    print(f"{len(items)} wrong-option explanations to generate")
+    if not items:
+        return
+
+    run_batch(
+        items,
+        produce=lambda job: "".join(generate.stream_solution(
+            job["question"], job["correct_answer"], job["given_answer"], job["options"]
+        )),
+        store=lambda key, job, solution: solution_cache_repo.put(
+            key[1], solution, key[0], question_key=job["qid"]
+        ),
+        flush=solution_cache_repo.flush,
+        noun="solution",
+        workers=workers,
+        checkpoint_every=checkpoint_every,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Pre-generate explanations for every wrong option of every question in the bank"
+    )
+    parser.add_argument("--standard", type=int, choices=[9, 10],
+                        help="Only this class (default: both)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent generations")
+    parser.add_argument("--limit", type=int,
+                        help="Stop after this many explanations")
+    args = parser.parse_args()
+    standards = [args.standard] if args.standard else [9, 10]
+    pregenerate_solutions(standards, workers=args.workers, limit=args.limit)
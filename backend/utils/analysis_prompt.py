@@ -0,0 +1,79 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+# Words, numbers and single punctuation marks; each piece costs about one
+# token per four characters in common BPE vocabularies
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough, dependency-free token count; errs slightly high for English and LaTeX."""
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECES.findall(text))
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    text = " ".join(str(text).split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars - 1].rstrip() + "…"
+
+
+def _lesson_name(lesson_id: str, lesson: Dict[str, Any], lessons: Sequence[str]) -> str:
+    """
+    The exam's name for an analytics key: "L{n}" is the n-th lesson of the
+    exam (generate.generate_exam_questions numbers them from 1). Falls back to
+    the stored "Lesson n" label for keys outside the list.
+    """
+    number = lesson_id[1:]
+    if number.isdigit() and 1 <= int(number) <= len(lessons):
+        return lessons[int(number) - 1]
+    return lesson["lesson_name"]
+
+
+def build_results_summary(
+    results: Sequence[Dict[str, Any]],
+    lesson_analytics: Optional[Dict[str, Dict[str, Any]]] = None,
+    token_budget: int = 1500,
+    max_item_chars: int = 200,
+    lessons: Sequence[str] = (),
+) -> str:
+    """
+    Compact "Results" section for the performance analysis prompt: one line
+    per lesson (from utils.data_utils.calculate_lesson_analytics, named after
+    the exam's `lessons`), then the incorrectly answered questions with their
+    answers, each truncated to `max_item_chars`. Items are added until
+    `token_budget` estimated tokens are used, so the prompt stays the same
+    size however long the exam is. Correct answers are only counted, never
+    listed.
+    """
+    lines: List[str] = []
+    if lesson_analytics:
+        lines.append("Per lesson (correct/total):")
+        ordered = sorted(lesson_analytics.items(), key=lambda item: item[1]["percentage"])
+        for lesson_id, lesson in ordered:
+            lines.append(
+                f"- {_lesson_name(lesson_id, lesson, lessons)}:"
+                f" {lesson['questions_correct']}/{lesson['questions_total']}"
+                f" ({lesson['percentage']:.0f}%)"
+            )
+
+    incorrect = [r for r in results if not r.get("is_correct")]
+    if not incorrect:
+        lines.append("All questions answered correctly.")
+        return "\n".join(lines)
+
+    lines.append(f"Incorrect answers ({len(incorrect)}):")
+    used = estimate_tokens("\n".join(lines))
+    for shown, r in enumerate(incorrect):
+        item = (
+            f"Q{r.get('question-no', shown + 1)}: {_truncate(r['question'], max_item_chars)}\n"
+            f"  Chose {_truncate(r['selected_answer'], max_item_chars // 2)};"
+            f" correct {_truncate(r['correct_answer'], max_item_chars // 2)}"
+        )
+        cost = estimate_tokens(item)
+        if used + cost > token_budget:
+            lines.append(f"(+{len(incorrect) - shown} more incorrect answers not listed)")
+            break
+        lines.append(item)
+        used += cost
+    return "\n".join(lines)
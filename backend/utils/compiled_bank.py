@@ -0,0 +1,188 @@
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+# Binary question bank layout (all integers little-endian):
+#
+#   header     HEADER
+#   str index  (n_strings + 1) x u32 offsets into the string data
+#   str data   UTF-8 bytes of every interned string
+#   lessons    n_lessons x LESSON_RECORD (standard, subject, lesson, first, count)
+#   questions  n_questions x QUESTION_RECORD, grouped by lesson
+#
+# Every string (question text, option keys and values, subjects, lesson
+# names) is stored once and referenced by its index, so repeated options
+# such as "True"/"False" or the assertion-reason choices cost 4 bytes each.
+# Each question record also carries its stable global ID (see
+# utils.question_bank.assign_question_ids) so it never has to be rehashed.
+
+MAGIC = b"ACEQBANK"
+VERSION = 2
+COMPILED_BANK_FILENAME = "question_bank.bin"
+
+HEADER = struct.Struct("<8sIIIIIIII")
+LESSON_RECORD = struct.Struct("<IIIII")
+# question id sid, question sid, 4 option key sids, 4 option value sids, answer position
+QUESTION_RECORD = struct.Struct("<II4I4IB3x")
+
+LessonKey = Tuple[int, str, str]
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, value: str) -> int:
+        sid = self._ids.get(value)
+        if sid is None:
+            sid = len(self.strings)
+            self._ids[value] = sid
+            self.strings.append(value)
+        return sid
+
+
+def compile_bank(lessons: Dict[LessonKey, Iterable[dict]], out_path: str) -> Tuple[int, int]:
+    """
+    Write the given per-lesson questions to out_path in the binary format.
+    Questions must already be valid (four options, answer among them) and
+    carry their "qid".
+    Returns (number of lessons, number of questions).
+    """
+    strings = _StringTable()
+    lesson_records = []
+    question_records = []
+
+    for (standard, subject, lesson), questions in sorted(lessons.items()):
+        first = len(question_records)
+        for q in questions:
+            keys = list(q["options"].keys())
+            question_records.append(
+                QUESTION_RECORD.pack(
+                    strings.intern(q["qid"]),
+                    strings.intern(q["question"]),
+                    *[strings.intern(k) for k in keys],
+                    *[strings.intern(q["options"][k]) for k in keys],
+                    keys.index(q["answer"]),
+                )
+            )
+        lesson_records.append(
+            LESSON_RECORD.pack(
+                standard,
+                strings.intern(subject),
+                strings.intern(lesson),
+                first,
+                len(question_records) - first,
+            )
+        )
+
+    encoded = [s.encode("utf-8") for s in strings.strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    str_index_pos = HEADER.size
+    str_data_pos = str_index_pos + 4 * len(offsets)
+    lesson_pos = str_data_pos + offsets[-1]
+    question_pos = lesson_pos + LESSON_RECORD.size * len(lesson_records)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(encoded),
+                len(lesson_records),
+                len(question_records),
+                str_index_pos,
+                str_data_pos,
+                lesson_pos,
+                question_pos,
+            )
+        )
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.writelines(encoded)
+        f.writelines(lesson_records)
+        f.writelines(question_records)
+    # Readers that already mapped the old file keep their view
+    os.replace(tmp_path, out_path)
+    return len(lesson_records), len(question_records)
+
+
+class MappedLesson(Sequence):
+    """Lazy, read-only view of one lesson's questions inside a MappedBank."""
+
+    def __init__(self, bank: "MappedBank", first: int, count: int) -> None:
+        self._bank = bank
+        self._first = first
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("question index out of range")
+        return self._bank.decode_question(self._first + index)
+
+
+class MappedBank:
+    """
+    Read-only mmap of a compiled question bank. The file is shared between
+    worker processes through the page cache; questions are decoded on access.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.n_strings,
+            self.n_lessons,
+            self.n_questions,
+            self._str_index_pos,
+            self._str_data_pos,
+            self._lesson_pos,
+            self._question_pos,
+        ) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} compiled question bank")
+        self.string = lru_cache(maxsize=4096)(self._read_string)
+
+    def _read_string(self, sid: int) -> str:
+        start, end = struct.unpack_from("<II", self._mm, self._str_index_pos + 4 * sid)
+        base = self._str_data_pos
+        return self._mm[base + start:base + end].decode("utf-8")
+
+    def decode_question(self, position: int) -> dict:
+        fields = QUESTION_RECORD.unpack_from(
+            self._mm, self._question_pos + QUESTION_RECORD.size * position
+        )
+        keys = [self.string(sid) for sid in fields[2:6]]
+        values = [self.string(sid) for sid in fields[6:10]]
+        return {
+            "qid": self.string(fields[0]),
+            "question": self.string(fields[1]),
+            "options": dict(zip(keys, values)),
+            "answer": keys[fields[10]],
+        }
+
+    def lessons(self) -> Dict[LessonKey, MappedLesson]:
+        result = {}
+        for i in range(self.n_lessons):
+            standard, subject_sid, lesson_sid, first, count = LESSON_RECORD.unpack_from(
+                self._mm, self._lesson_pos + LESSON_RECORD.size * i
+            )
+            key = (standard, self.string(subject_sid), self.string(lesson_sid))
+            result[key] = MappedLesson(self, first, count)
+        return result
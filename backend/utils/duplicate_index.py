@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import re
+import zlib
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DUPLICATE_INDEX_FILENAME = "question_clusters.json"
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+_PRIME = (1 << 31) - 1
+
+
+def question_shingles(question: dict, k: int = SHINGLE_SIZE) -> set:
+    """Character k-grams of the normalised question text and its option values."""
+    parts = [question["question"], *sorted(str(v) for v in question["options"].values())]
+    text = " ".join(re.findall(r"\w+", " ".join(parts).lower()))
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over shingle sets using (a * x + b) mod p permutations."""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        # With a, b, x below p = 2**31 - 1, a * x + b fits in uint64 and still wraps mod p
+        self.a = rng.integers(1, _PRIME, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_permutations, dtype=np.uint64)
+
+    def signature(self, shingles: Iterable[str]) -> np.ndarray:
+        x = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingles), dtype=np.uint64
+        )
+        hashed = (self.a[:, None] * x[None, :] + self.b[:, None]) % np.uint64(_PRIME)
+        return hashed.min(axis=1)
+
+
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def find_duplicate_clusters(
+    questions: List[dict],
+    threshold: float = 0.7,
+    bands: int = 16,
+) -> List[List[str]]:
+    """
+    Group near-duplicate questions (estimated Jaccard similarity of their
+    shingles >= threshold) into clusters of qids. Candidate pairs come from
+    locality-sensitive hashing over `bands` bands of the MinHash signature,
+    so only questions sharing a band are ever compared.
+    """
+    if not questions:
+        return []
+    hasher = MinHasher()
+    signatures = np.stack([hasher.signature(question_shingles(q)) for q in questions])
+    rows = signatures.shape[1] // bands
+
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    for i, signature in enumerate(signatures):
+        for band in range(bands):
+            chunk = signature[band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault((band, chunk), []).append(i)
+
+    union_find = _UnionFind(len(questions))
+    compared = set()
+    for members in buckets.values():
+        for i, j in combinations(members, 2):
+            if (i, j) in compared:
+                continue
+            compared.add((i, j))
+            if np.mean(signatures[i] == signatures[j]) >= threshold:
+                union_find.union(i, j)
+
+    groups: Dict[int, List[str]] = {}
+    for i, q in enumerate(questions):
+        groups.setdefault(union_find.find(i), []).append(q["qid"])
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def save_duplicate_index(clusters: List[List[str]], out_path: str, threshold: float) -> None:
+    """Store clusters as {qid: cluster id}; the cluster id is its smallest member."""
+    index = {qid: group[0] for group in clusters for qid in group}
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"threshold": threshold, "clusters": index}, f, indent=2)
+    os.replace(tmp_path, out_path)
+
+
+def load_duplicate_index(data_dir: str) -> Optional[Dict[str, str]]:
+    """Return {qid: cluster id}, or None when the index has not been built."""
+    path = os.path.join(data_dir, DUPLICATE_INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("clusters", {})
+    except Exception as e:
+        logging.error(f"Could not load duplicate index {path}: {e}")
+        return None
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from utils.question_bank import BankSnapshot
+
+# Exam documents store references instead of full questions:
+#
+#   bank question  {"qid": ..., "perm": "2031", "lesson": 1, "l-id": "L1Q7"}
+#   test question  {"tq": 3}   index into the parent test's "questions"
+#
+# A qid is a content hash, so editing a bank question gives it a new ID;
+# the old version is archived (utils.question_archive) and exams that still
+# reference it are resolved from there.
+# Older exams embed full question dicts; those are passed through as-is.
+
+_BANK_REF_FIELDS = ("qid", "perm", "lesson", "l-id")
+
+
+class ExamHydrationError(Exception):
+    """An exam references a question that can no longer be resolved."""
+
+
+def compact_exam_question(question: Dict[str, Any]) -> Dict[str, Any]:
+    """Reference to a generated (bank) exam question, for storage."""
+    return {field: question[field] for field in _BANK_REF_FIELDS if field in question}
+
+
+def test_question_refs(count: int) -> List[Dict[str, int]]:
+    """References to every question of the parent test, in test order."""
+    return [{"tq": i} for i in range(count)]
+
+
+def hydrate_exam_questions(
+    questions: Sequence[Dict[str, Any]],
+    bank: BankSnapshot,
+    test_questions: Optional[Sequence[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Resolve stored exam questions into full question dicts (still carrying
+    their "perm"; see utils.generate_utils.render_question). Returned dicts
+    are fresh copies and safe to modify.
+    """
+    hydrated = []
+    for i, ref in enumerate(questions):
+        if "tq" in ref:
+            if test_questions is None or not 0 <= ref["tq"] < len(test_questions):
+                raise ExamHydrationError(f"Question {i + 1} refers to a test question that no longer exists")
+            hydrated.append(dict(test_questions[ref["tq"]]))
+        elif "question" in ref:
+            hydrated.append(dict(ref))
+        else:
+            question = bank.find_question(ref.get("qid", ""))
+            if question is None:
+                raise ExamHydrationError(f"Question {i + 1} ({ref.get('qid')}) is no longer in the question bank")
+            hydrated.append({**question, **{k: ref[k] for k in _BANK_REF_FIELDS if k in ref}})
+    return hydrated
+
+
+def load_exam_questions(exam: Dict[str, Any], bank: BankSnapshot, test_repo, is_class10: bool) -> List[Dict[str, Any]]:
+    """Full questions of a stored exam, fetching the parent test when needed."""
+    test_questions = None
+    if any("tq" in q for q in exam["questions"]):
+        test = test_repo.get_test(exam.get("test-id"), is_class10, include_inactive=True)
+        if not test:
+            raise ExamHydrationError(f"Test {exam.get('test-id')} for exam {exam.get('exam-id')} no longer exists")
+        test_questions = test.get("questions", [])
+    return hydrate_exam_questions(exam["questions"], bank, test_questions)
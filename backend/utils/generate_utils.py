@@ -48,68 +48,51 @@ def parse_question_xml(xml_text):
         print(f"Error parsing question XML: {e}")
         return None
 
-def shuffle_question_options(questions):
+IDENTITY_PERMUTATION = "0123"
+
+
+def is_assertion_reason_question(question):
+    """Assertion-reason options must keep their fixed order."""
+    return any(
+        "assertion" in str(value).lower() and "reason" in str(value).lower()
+        for value in question["options"].values()
+    )
+
+
+def random_option_permutation(question):
     """
-    Shuffle the options of each question while maintaining the correct answer.
-    Assertion reason questions will not have their options shuffled.
+    Pick an option order for one exam as a 4-character string: the i-th
+    character is the index of the original option shown in the i-th slot.
+    Assertion reason questions are never shuffled.
     """
+    if is_assertion_reason_question(question):
+        return IDENTITY_PERMUTATION
+    order = list(IDENTITY_PERMUTATION)
+    random.shuffle(order)
+    return "".join(order)
+
 
-    for question in questions:
-        # Check if this is an assertion reason question by looking at the options
-        is_assertion_reason = any(
-            "assertion" in str(value).lower() and "reason" in str(value).lower()
-            for value in question["options"].values()
-        )
-
-        if not is_assertion_reason:
-            # Store the correct answer value
-            correct_answer_key = question["answer"]
-            correct_answer_value = question["options"][correct_answer_key]
-
-            # Get all option values and shuffle them
-            option_values = list(question["options"].values())
-            random.shuffle(option_values)
-
-            # Create new options dictionary with shuffled values
-            option_keys = list(
-                question["options"].keys()
-            )  # usually ['a', 'b', 'c', 'd']
-            question["options"] = dict(zip(option_keys, option_values))
-
-            # Find the new key for the correct answer
-            for key, value in question["options"].items():
-                if value == correct_answer_value:
-                    question["answer"] = key
-                    break
-
-    return questions
-
-def remove_duplicates_and_replace(questions, available_questions):
+def render_question(question):
     """
-    Remove duplicate questions and replace them with new ones from available questions.
-    Simple exact match comparison.
+    Return the question as the student sees it: options reordered by its
+    "perm" and the answer key remapped to match. The stored question (often
+    a shared question bank entry) is never modified. Questions without a
+    permutation, such as those in older exams, are returned unchanged.
     """
-    seen_questions = {}  # question text -> question dict
-    unique_questions = []
-
-    for question in questions:
-        q_text = question['question'].strip().lower()
-        if q_text not in seen_questions:
-            seen_questions[q_text] = question
-            unique_questions.append(question)
-
-    # If we removed any duplicates, try to replace them
-    remaining_questions = [
-        q for q in available_questions.values()
-        if q['question'].strip().lower() not in seen_questions
-    ]
-
-    while len(unique_questions) < len(questions) and remaining_questions:
-        new_question = random.choice(remaining_questions)
-        unique_questions.append(new_question)
-        remaining_questions.remove(new_question)
-
-    return unique_questions
+    perm = question.get("perm")
+    if not perm:
+        return question
+    keys = list(question["options"].keys())
+    values = list(question["options"].values())
+    rendered = {k: v for k, v in question.items() if k != "perm"}
+    rendered["options"] = {key: values[int(i)] for key, i in zip(keys, perm)}
+    if "answer" in question:
+        rendered["answer"] = keys[perm.index(str(keys.index(question["answer"])))]
+    return rendered
+
+
+def render_exam_questions(questions):
+    return [render_question(q) for q in questions]
 
 def parse_questions_from_json(file_path):
     # Update to explicitly use UTF-8 encoding
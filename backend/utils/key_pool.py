@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class KeysExhaustedError(Exception):
+    """Every key of a provider is cooling down after rate limits."""
+
+
+class ApiKey:
+    """One configured key (PROVIDER_API_KEY[_n] with its PROVIDER_BASE_URL[_n])."""
+
+    def __init__(self, name: str, api_key: Optional[str], base_url: Optional[str]) -> None:
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.consecutive_limits = 0
+        self.cooldown_until = 0.0
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "key": self.name,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+        }
+
+
+class KeyPool:
+    """
+    All keys of one provider. acquire() hands out the key with the fewest
+    requests in flight (then the least used) among those not cooling down;
+    a key that gets a 429 cools down for the provider's Retry-After, or for
+    LLM_KEY_COOLDOWN seconds doubled on each consecutive 429 (up to
+    LLM_KEY_MAX_COOLDOWN). Callers release() every key they acquire.
+    """
+
+    def __init__(self, provider: str, keys: List[ApiKey]) -> None:
+        if not keys:
+            raise ValueError(f"No API keys configured for provider {provider}")
+        self.provider = provider
+        self.keys = keys
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def acquire(self) -> Tuple[ApiKey, float]:
+        """
+        A key and how many seconds to wait before using it (0 unless every
+        key is cooling down, in which case it is the one available soonest).
+        """
+        now = time.monotonic()
+        with self._lock:
+            ready = [k for k in self.keys if k.cooldown_until <= now]
+            if ready:
+                key = min(ready, key=lambda k: (k.in_flight, k.requests))
+                wait = 0.0
+            else:
+                key = min(self.keys, key=lambda k: k.cooldown_until)
+                wait = key.cooldown_until - now
+            key.in_flight += 1
+            key.requests += 1
+        return key, wait
+
+    def release(self, key: ApiKey) -> None:
+        with self._lock:
+            key.in_flight -= 1
+
+    def has_ready_key(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return any(k.cooldown_until <= now for k in self.keys)
+
+    def rate_limited(self, key: ApiKey, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            key.rate_limited += 1
+            key.consecutive_limits += 1
+            if retry_after is None:
+                base = float(os.getenv("LLM_KEY_COOLDOWN", "10"))
+                cap = float(os.getenv("LLM_KEY_MAX_COOLDOWN", "120"))
+                retry_after = min(base * 2 ** (key.consecutive_limits - 1), cap)
+            # At least a second, so "Retry-After: 0" does not send the next request straight back
+            key.cooldown_until = max(key.cooldown_until, time.monotonic() + max(retry_after, 1.0))
+
+    def succeeded(self, key: ApiKey) -> None:
+        with self._lock:
+            key.consecutive_limits = 0
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [k.as_dict(now) for k in self.keys]
+
+
+def provider_keys(provider: str) -> List[ApiKey]:
+    """Keys from PROVIDER_API_KEY/PROVIDER_BASE_URL, then the _2, _3, ... pairs."""
+    provider = provider.upper()
+    keys = []
+    if os.getenv(f"{provider}_API_KEY"):
+        keys.append(ApiKey(f"{provider}_API_KEY", os.getenv(f"{provider}_API_KEY"), os.getenv(f"{provider}_BASE_URL")))
+    i = 2
+    while os.getenv(f"{provider}_API_KEY_{i}"):
+        keys.append(ApiKey(
+            f"{provider}_API_KEY_{i}",
+            os.getenv(f"{provider}_API_KEY_{i}"),
+            os.getenv(f"{provider}_BASE_URL_{i}") or os.getenv(f"{provider}_BASE_URL"),
+        ))
+        i += 1
+    return keys
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The Retry-After of a rate-limit error's HTTP response, if it has one."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class KeyPoolRegistry:
+    """One KeyPool per provider, built from the environment on first use."""
+
+    def __init__(self) -> None:
+        self._pools: Dict[str, KeyPool] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, provider: str, config: Optional[Dict[str, Optional[str]]] = None) -> KeyPool:
+        """
+        The provider's pool. `config` ({"api_key", "base_url"}) is used as the
+        only key when the environment has none for the provider.
+        """
+        name = provider.upper()
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    keys = provider_keys(name)
+                    if not keys and config is not None:
+                        keys = [ApiKey(f"{name}_API_KEY", config.get("api_key"), config.get("base_url"))]
+                    pool = self._pools[name] = KeyPool(name, keys)
+        return pool
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            pools = dict(self._pools)
+        return {name: pool.snapshot() for name, pool in pools.items()}
+
+
+key_pools = KeyPoolRegistry()
@@ -0,0 +1,112 @@
+from typing import Iterable, Iterator, List
+
+# Scanner states
+_TEXT = 0
+_INLINE = 1    # inside $...$
+_DISPLAY = 2   # inside $$...$$
+
+
+class LatexStreamChunker:
+    """
+    Splits streamed model output into pieces that are safe to send to the
+    client: plain text is passed through as soon as it arrives, while a math
+    span ($...$ or $$...$$) is held back until its closing delimiter so the
+    frontend never renders half a formula.
+
+    Each character is looked at once. Only the open math span (plus at most
+    one undecided character, a trailing "$" or "\\") is buffered, so long
+    streams cost O(n). A "$" preceded by a backslash is literal text.
+
+    Completed math spans are emitted with `math_prefix` in front (a space by
+    default, as the hint and solution streams always did). An unterminated
+    span is returned as-is by flush().
+    """
+
+    def __init__(self, math_prefix: str = " ") -> None:
+        self.math_prefix = math_prefix
+        self._state = _TEXT
+        self._math: List[str] = []
+        self._carry = ""
+
+    @staticmethod
+    def _find_dollar(text: str, start: int) -> int:
+        """Index of the next unescaped "$" at or after start, or -1."""
+        j = text.find("$", start)
+        while j > 0 and text[j - 1] == "\\":
+            j = text.find("$", j + 1)
+        return j
+
+    def feed(self, text: str) -> List[str]:
+        """Consume the next chunk of output and return the pieces ready to send."""
+        if self._carry:
+            text = self._carry + text
+            self._carry = ""
+        out: List[str] = []
+        i, n = 0, len(text)
+        while i < n:
+            j = self._find_dollar(text, i)
+            if j == -1:
+                # No delimiter; hold a trailing backslash since it may escape the next "$"
+                end = n - 1 if text.endswith("\\") else n
+                if self._state == _TEXT:
+                    if end > i:
+                        out.append(text[i:end])
+                else:
+                    self._math.append(text[i:end])
+                self._carry = text[end:]
+                break
+
+            if self._state == _TEXT:
+                if j > i:
+                    out.append(text[i:j])
+                if j + 1 == n:
+                    self._carry = "$"  # "$" or the start of "$$", decided by the next chunk
+                    break
+                if text[j + 1] == "$":
+                    self._state, self._math, i = _DISPLAY, ["$$"], j + 2
+                else:
+                    self._state, self._math, i = _INLINE, ["$"], j + 1
+                continue
+
+            if self._state == _INLINE:
+                self._math.append(text[i:j + 1])
+                i = j + 1
+            else:
+                if j + 1 == n:
+                    self._math.append(text[i:j])
+                    self._carry = "$"
+                    break
+                if text[j + 1] != "$":
+                    # A lone "$" inside display math is part of the formula
+                    self._math.append(text[i:j + 1])
+                    i = j + 1
+                    continue
+                self._math.append(text[i:j + 2])
+                i = j + 2
+            out.append(self.math_prefix + "".join(self._math))
+            self._math = []
+            self._state = _TEXT
+        return out
+
+    def flush(self) -> str:
+        """Whatever is still held back at the end of the stream."""
+        rest = "".join(self._math) + self._carry
+        self._math = []
+        self._carry = ""
+        self._state = _TEXT
+        return rest
+
+
+def latex_chunks(stream: Iterable[str], math_prefix: str = " ") -> Iterator[str]:
+    """Re-chunk a stream of model output so math spans are never split."""
+    chunker = LatexStreamChunker(math_prefix)
+    for content in stream:
+        yield from chunker.feed(content)
+    rest = chunker.flush()
+    if rest:
+        yield rest
+
+
+def latex_text(text: str, math_prefix: str = " ") -> str:
+    """The complete text a stream of `text` is delivered as by latex_chunks()."""
+    return "".join(latex_chunks([text], math_prefix))
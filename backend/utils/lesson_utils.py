@@ -1,6 +1,12 @@
 import os
 import json
-from typing import List
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+DATA_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+)
 
 def lesson2filepath(subject, lesson, class10=False):
     subject_lower = subject.lower()
@@ -34,21 +40,86 @@ def lesson2filepath(subject, lesson, class10=False):
 
     return os.path.normpath(path)
 
+class _CatalogEntry:
+    def __init__(self, mtime: float, lessons: Dict[str, List[str]], class10: bool) -> None:
+        self.mtime = mtime
+        self.lessons = lessons
+        self.subject_of: Dict[str, str] = {}
+        self.paths: Dict[Tuple[str, str], str] = {}
+        for subject, subject_lessons in lessons.items():
+            for lesson in subject_lessons:
+                # First subject wins, as the old per-request scan did
+                self.subject_of.setdefault(lesson, subject)
+                self.paths[(subject, lesson)] = lesson2filepath(subject, lesson, class10)
+
+
+class LessonCatalog:
+    """
+    In-process view of lessons.json / lessons10.json with subject->lessons,
+    lesson->subject and (subject, lesson)->question file maps. Each file is
+    parsed once and re-parsed only when its modification time changes.
+    Returned lists are shared; callers must not modify them.
+    """
+
+    def __init__(self, data_path: str = DATA_PATH) -> None:
+        self.data_path = data_path
+        self._entries: Dict[bool, _CatalogEntry] = {}
+        self._lock = threading.Lock()
+
+    def _file(self, class10: bool) -> str:
+        return os.path.join(self.data_path, "lessons10.json" if class10 else "lessons.json")
+
+    def _entry(self, class10: bool) -> _CatalogEntry:
+        path = self._file(class10)
+        mtime = os.stat(path).st_mtime
+        entry = self._entries.get(class10)
+        if entry is None or entry.mtime != mtime:
+            with self._lock:
+                entry = self._entries.get(class10)
+                if entry is None or entry.mtime != mtime:
+                    try:
+                        with open(path, encoding="utf-8") as f:
+                            entry = _CatalogEntry(mtime, json.load(f), class10)
+                    except ValueError as e:
+                        # Probably caught mid-write; keep serving the previous catalog
+                        if entry is None:
+                            raise
+                        logging.warning(f"Could not reload {path}, keeping previous catalog: {e}")
+                        return entry
+                    self._entries[class10] = entry
+        return entry
+
+    def refresh(self) -> None:
+        """Re-read any lessons file that changed, off the request path."""
+        for class10 in (False, True):
+            self._entry(class10)
+
+    def subjects(self, class10: bool = False) -> List[str]:
+        return list(self._entry(class10).lessons.keys())
+
+    def has_subject(self, subject: str, class10: bool = False) -> bool:
+        return subject in self._entry(class10).lessons
+
+    def lessons_for(self, subject: str, class10: bool = False) -> List[str]:
+        return self._entry(class10).lessons.get(subject, [])
+
+    def subject_for_lesson(self, lesson: str, class10: bool = False) -> Optional[str]:
+        return self._entry(class10).subject_of.get(lesson)
+
+    def lesson_path(self, subject: str, lesson: str, class10: bool = False) -> str:
+        """Question file of a lesson; lessons not in the catalog fall back to lesson2filepath."""
+        path = self._entry(class10).paths.get((subject, lesson))
+        return path if path is not None else lesson2filepath(subject, lesson, class10)
+
+
+lesson_catalog = LessonCatalog()
+
+
 def get_all_lessons_for_subject(subject: str, class10: bool = False) -> List[str]:
-    """Fetches all lessons for a given subject from the data files."""
-    lessons_file = "lessons10.json" if class10 else "lessons.json"
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(script_dir, "..", "data")
-    with open(os.path.join(data_path, lessons_file)) as f:
-        lessons = json.load(f)
-    return lessons.get(subject, [])
+    """Fetches all lessons for a given subject from the lesson catalog."""
+    return lesson_catalog.lessons_for(subject, class10)
 
 
 def get_all_subjects(class10: bool = False) -> List[str]:
-    """Fetches all subjects from the data files."""
-    lessons_file = "lessons10.json" if class10 else "lessons.json"
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(script_dir, "..", "data")
-    with open(os.path.join(data_path, lessons_file)) as f:
-        lessons = json.load(f)
-    return list(lessons.keys())
+    """Fetches all subjects from the lesson catalog."""
+    return lesson_catalog.subjects(class10)
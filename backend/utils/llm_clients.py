@@ -0,0 +1,79 @@
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from utils.llm_metrics import count_http_request
+
+ClientKey = Tuple[str, Optional[str], Optional[str]]
+
+
+def _on_request(request: httpx.Request) -> None:
+    count_http_request()
+
+
+async def _on_request_async(request: httpx.Request) -> None:
+    count_http_request()
+
+
+class LLMClientRegistry:
+    """
+    Long-lived OpenAI-compatible clients keyed by (provider, base_url, api_key).
+
+    Each client owns one httpx connection pool, so repeated calls to the same
+    provider reuse keep-alive connections instead of paying for a new TCP and
+    TLS handshake every time. Sync clients are thread-safe and shared by all
+    request threads; async clients must only be used on the event loop of
+    utils.llm_gateway. Every HTTP request is counted for utils.llm_metrics,
+    which is how client-side retries show up there.
+    """
+
+    def __init__(self, client_cls=OpenAI, http_client_cls=DefaultHttpxClient, request_hook=_on_request) -> None:
+        self._client_cls = client_cls
+        self._http_client_cls = http_client_cls
+        self._request_hook = request_hook
+        self._clients: Dict[ClientKey, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, base_url: Optional[str], api_key: Optional[str]) -> Any:
+        key = (provider.upper(), base_url, api_key)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._create(base_url, api_key)
+                    self._clients[key] = client
+        return client
+
+    def _create(self, base_url: Optional[str], api_key: Optional[str]) -> Any:
+        # Read at creation time so values from .env (loaded after imports) apply
+        http_client = self._http_client_cls(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")),
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120")),
+            ),
+            event_hooks={"request": [self._request_hook]},
+        )
+        return self._client_cls(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            timeout=httpx.Timeout(
+                float(os.getenv("LLM_TIMEOUT", "600")),
+                connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+            ),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+        )
+
+
+llm_clients = LLMClientRegistry()
+async_llm_clients = LLMClientRegistry(AsyncOpenAI, DefaultAsyncHttpxClient, _on_request_async)
+
+
+def get_llm_client(provider: str, config: Dict[str, Optional[str]]) -> OpenAI:
+    """Shared client for a provider config of the form {"api_key": ..., "base_url": ...}."""
+    return llm_clients.get(provider, config.get("base_url"), config.get("api_key"))
@@ -0,0 +1,602 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from openai import APIConnectionError, BadRequestError, InternalServerError, RateLimitError
+
+from utils.key_pool import KeysExhaustedError, key_pools, retry_after_seconds
+from utils.llm_clients import async_llm_clients
+from utils.llm_metrics import llm_metrics
+from utils.model_router import model_router
+
+# Markers on the queue between the event loop and a synchronous stream reader
+_CHUNK = "chunk"
+_DONE = "done"
+_ERROR = "error"
+
+# (provider, provider config, request params) for one attempt of a request
+Target = Tuple[str, Dict[str, Optional[str]], Dict[str, Any]]
+Emit = Callable[[str, Any], None]
+
+
+def prompt_fingerprint(model_type: str, messages: Sequence[Dict[str, Any]], scope: str = "") -> str:
+    """Key under which identical requests (same model list, prompt and scope) are coalesced."""
+    payload = json.dumps([model_type, scope, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class GatewayCounters:
+    """Counters updated on the event loop and read from request threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def add(self, **deltas: float) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+
+class HedgeStats(GatewayCounters):
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests = 0
+        self.fired = 0
+        self.backup_wins = 0
+        self.primary_wins = 0
+        self.saved_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hedged_requests": self.requests,
+                "hedges_fired": self.fired,
+                "fire_rate": round(self.fired / self.requests, 4) if self.requests else 0.0,
+                "backup_wins": self.backup_wins,
+                "primary_wins_after_hedge": self.primary_wins,
+                "estimated_saved_seconds": round(self.saved_seconds, 3),
+                "estimated_saved_per_backup_win": (
+                    round(self.saved_seconds / self.backup_wins, 3) if self.backup_wins else 0.0
+                ),
+            }
+
+
+class CoalesceStats(GatewayCounters):
+    def __init__(self) -> None:
+        super().__init__()
+        self.flights = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.flights + self.followers
+            return {
+                "upstream_streams": self.flights,
+                "coalesced_requests": self.followers,
+                "coalesce_rate": round(self.followers / requests, 4) if requests else 0.0,
+                "abandoned_streams": self.abandoned,
+            }
+
+
+class _Flight:
+    """One upstream stream shared by every reader of the same key."""
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.readers = 0
+        self.future = None
+        # Every subscriber's on_complete; each may store the result under its own key
+        self.callbacks: List[Callable[[str], None]] = []
+        self.cond = threading.Condition()
+
+
+class LLMGateway:
+    """
+    Single asyncio event loop, on its own daemon thread, that runs every LLM
+    call for the Flask worker threads.
+
+    Requests are coroutines rather than blocked OS threads, and each one must
+    acquire a per-provider and a per-model semaphore before it reaches the
+    provider, so a slow or stalled provider can only hold its own slots.
+    Limits come from the environment:
+
+        <PROVIDER>_MAX_CONCURRENCY  or LLM_PROVIDER_CONCURRENCY (default 32)
+        LLM_MODEL_CONCURRENCY                                   (default 16)
+
+    complete() blocks the calling thread until the reply is ready; stream()
+    returns a plain iterator fed through a queue, so it can back a Flask SSE
+    response directly. Abandoning the iterator cancels the request.
+
+    stream_hedged() is the same, but when the first model has not sent a
+    token within its usual time to first token (LLM_HEDGE_PERCENTILE of its
+    recent streams), the request is also started on a second model. Whichever
+    answers first is streamed and the other is cancelled.
+
+    stream_shared() coalesces identical requests: while a stream for a key
+    is running, further readers of that key attach to it, get the chunks
+    produced so far and then the live ones. The upstream request is
+    cancelled only when every reader has gone, and its final text is passed
+    to the on_complete callback of every reader that joined (e.g. to fill a
+    cache).
+
+    The outcome of every call (latency, time to first token, output size or
+    the error) is reported to the model router so routing follows the
+    models' real behaviour; cancelled calls and rate limits (a key problem,
+    not the model's) are not counted. Every call is also measured in
+    utils.llm_metrics under its `purpose` (the model list it was routed
+    from). Streams ask for token usage (stream_options) unless
+    <PROVIDER>_STREAM_USAGE, or LLM_STREAM_USAGE, is false; a provider that
+    answers that with a 400 gets the request again without it, and is not
+    asked again until restart. Calls that end without usage record an
+    estimate instead.
+
+    Streams started with background=True (e.g. solution prefetching) first
+    take one of the provider's LLM_BACKGROUND_CONCURRENCY slots, or
+    <PROVIDER>_BACKGROUND_CONCURRENCY, and only then queue for the provider
+    and model limits. Background work can therefore never hold more than
+    that many of the provider's slots; the rest stay free for live requests.
+
+    Requests are spread over all of a provider's API keys (utils.key_pool).
+    A 429 puts that key into cooldown and the request moves to another key;
+    when every key is cooling down it waits for the first one to come back,
+    unless that is more than LLM_KEY_MAX_WAIT seconds away.
+    """
+
+    def __init__(self, clients=async_llm_clients, router=model_router, metrics=llm_metrics, keys=key_pools) -> None:
+        self._clients = clients
+        self._keys = keys
+        self._router = router
+        self._metrics = metrics
+        self.hedging = HedgeStats()
+        self.coalescing = CoalesceStats()
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        # Only touched from the event loop thread
+        self._provider_limits: Dict[str, asyncio.Semaphore] = {}
+        self._model_limits: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._background_limits: Dict[str, asyncio.Semaphore] = {}
+        # Providers that rejected stream_options
+        self._no_stream_usage: set = set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(
+                        target=loop.run_forever, name="llm-gateway", daemon=True
+                    )
+                    thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _limits(self, provider: str, model: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        provider = provider.upper()
+        provider_limit = self._provider_limits.get(provider)
+        if provider_limit is None:
+            size = os.getenv(f"{provider}_MAX_CONCURRENCY") or os.getenv("LLM_PROVIDER_CONCURRENCY", "32")
+            provider_limit = self._provider_limits[provider] = asyncio.Semaphore(int(size))
+        model_limit = self._model_limits.get((provider, model))
+        if model_limit is None:
+            size = os.getenv("LLM_MODEL_CONCURRENCY", "16")
+            model_limit = self._model_limits[(provider, model)] = asyncio.Semaphore(int(size))
+        return provider_limit, model_limit
+
+    @asynccontextmanager
+    async def _background_slot(self, provider: str, background: bool):
+        """Hold one of the provider's background slots when `background` is set."""
+        if not background:
+            yield
+            return
+        provider = provider.upper()
+        limit = self._background_limits.get(provider)
+        if limit is None:
+            size = os.getenv(f"{provider}_BACKGROUND_CONCURRENCY") or os.getenv("LLM_BACKGROUND_CONCURRENCY", "4")
+            limit = self._background_limits[provider] = asyncio.Semaphore(int(size))
+        async with limit:
+            yield
+
+    @asynccontextmanager
+    async def _leased_request(self, provider: str, config: Dict[str, Optional[str]], request: Dict[str, Any]):
+        """
+        Send a chat completion with one of the provider's keys, which stays
+        leased for the body of the block (a stream is read inside it).
+        With several keys the client's own retries are switched off so a 429
+        moves to another key at once; 5xx and connection errors are then
+        retried here instead, up to LLM_MAX_RETRIES times.
+        """
+        pool = self._keys.pool(provider, config)
+        max_wait = float(os.getenv("LLM_KEY_MAX_WAIT", "20"))
+        max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        retries = 0
+        last_error: Optional[BaseException] = None
+        for _ in range(2 * len(pool) + 1 + max_retries):
+            key, wait = pool.acquire()
+            try:
+                if wait > max_wait:
+                    if last_error is not None:
+                        raise last_error
+                    raise KeysExhaustedError(
+                        f"All {len(pool)} {provider} keys are rate limited for another {wait:.0f}s"
+                    )
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                client = self._clients.get(provider, key.base_url, key.api_key)
+                if len(pool) > 1:
+                    # Move to another key on 429 rather than retrying this one
+                    client = client.with_options(max_retries=0)
+                try:
+                    response = await client.chat.completions.create(**request)
+                except RateLimitError as e:
+                    pool.rate_limited(key, retry_after_seconds(e))
+                    logging.warning(f"{key.name} rate limited, cooling down")
+                    last_error = e
+                    continue
+                except (APIConnectionError, InternalServerError) as e:
+                    if len(pool) == 1 or retries >= max_retries:
+                        raise
+                    # The client's backoff: 0.5s, doubling, at most 8s
+                    await asyncio.sleep(min(0.5 * 2 ** retries, 8.0))
+                    retries += 1
+                    last_error = e
+                    continue
+                pool.succeeded(key)
+                yield response
+                return
+            finally:
+                pool.release(key)
+        raise last_error
+
+    def _record_failure(self, model: str, error: BaseException) -> None:
+        # Rate limits are a key problem, not the model's; they must not open its circuit
+        if not isinstance(error, (RateLimitError, KeysExhaustedError)):
+            self._router.record_failure(model, error)
+
+    def _stream_usage(self, provider: str) -> bool:
+        if provider.upper() in self._no_stream_usage:
+            return False
+        setting = os.getenv(f"{provider.upper()}_STREAM_USAGE") or os.getenv("LLM_STREAM_USAGE", "true")
+        return setting.lower() == "true"
+
+    async def _complete(
+        self,
+        provider: str,
+        config: Dict[str, Optional[str]],
+        params: Dict[str, Any],
+        purpose: str = "",
+    ) -> str:
+        model = f"{provider}/{params['model']}"
+        provider_limit, model_limit = self._limits(provider, params["model"])
+        async with provider_limit, model_limit:
+            with self._metrics.track(purpose, provider, params["model"]) as call:
+                started = time.monotonic()
+                try:
+                    async with self._leased_request(provider, config, dict(params, stream=False)) as response:
+                        content = response.choices[0].message.content
+                except Exception as e:
+                    self._record_failure(model, e)
+                    raise
+                call.usage(getattr(response, "usage", None))
+                call.estimate_usage(params["messages"], content or "")
+        self._router.record_success(model, time.monotonic() - started, output_chars=len(content or ""))
+        return content
+
+    async def _attempt(
+        self,
+        provider: str,
+        config: Dict[str, Optional[str]],
+        params: Dict[str, Any],
+        emit: Emit,
+        purpose: str = "",
+        background: bool = False,
+    ) -> None:
+        """Run one streaming request, passing (_CHUNK, text), then (_DONE, None) or (_ERROR, exc) to emit."""
+        model = f"{provider}/{params['model']}"
+        request = dict(params, stream=True)
+        ask_usage = "stream_options" not in request and self._stream_usage(provider)
+        if ask_usage:
+            request["stream_options"] = {"include_usage": True}
+        ttft = None
+        chars = 0
+        parts: List[str] = []
+
+        async def read(call, started, request):
+            nonlocal ttft, chars
+            async with self._leased_request(provider, config, request) as stream:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        content = chunk.choices[0].delta.content
+                        if ttft is None:
+                            ttft = time.monotonic() - started
+                            call.first_token()
+                        chars += len(content)
+                        parts.append(content)
+                        emit(_CHUNK, content)
+                    if getattr(chunk, "usage", None):
+                        call.usage(chunk.usage)
+
+        try:
+            provider_limit, model_limit = self._limits(provider, params["model"])
+            async with self._background_slot(provider, background), provider_limit, model_limit:
+                with self._metrics.track(purpose, provider, params["model"]) as call:
+                    started = time.monotonic()
+                    try:
+                        await read(call, started, request)
+                    except BadRequestError as e:
+                        if not ask_usage or chars:
+                            raise
+                        # Some OpenAI-compatible providers reject stream_options
+                        logging.warning(f"{provider} rejected stream_options, retrying without it: {e}")
+                        self._no_stream_usage.add(provider.upper())
+                        request.pop("stream_options")
+                        await read(call, started, request)
+                    finally:
+                        if parts:
+                            call.estimate_usage(params["messages"], "".join(parts))
+            self._router.record_success(model, time.monotonic() - started, ttft=ttft, output_chars=chars)
+            emit(_DONE, None)
+        except Exception as e:
+            self._record_failure(model, e)
+            emit(_ERROR, e)
+
+    async def _queued(self, run: Callable[[Emit], Any], out: queue.SimpleQueue) -> None:
+        """Run a streaming coroutine for a single reader, feeding its queue."""
+        try:
+            await run(lambda kind, value: out.put((kind, value)))
+        except asyncio.CancelledError:
+            out.put((_DONE, None))
+            raise
+
+    def _hedge_delay(self, model: str) -> float:
+        """Seconds to wait for the first token before starting the backup request."""
+        percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+        delay = self._router.ttft_percentile(model, percentile)
+        if delay is None:
+            delay = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))
+        return max(delay, float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3")))
+
+    async def _stream_hedged(
+        self,
+        primary: Target,
+        backup: Callable[[], Target],
+        emit: Emit,
+        purpose: str = "",
+        background: bool = False,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        attempts = []
+        models = []
+
+        def launch(target: Target) -> None:
+            index = len(attempts)
+            provider, config, params = target
+            models.append(f"{provider}/{params['model']}")
+            attempts.append(asyncio.ensure_future(self._attempt(
+                provider, config, params, lambda kind, value: events.put_nowait((index, kind, value)),
+                purpose, background,
+            )))
+
+        self.hedging.add(requests=1)
+        started = loop.time()
+        launch(primary)
+        hedge_at = started + self._hedge_delay(models[0])
+        hedged = False
+        winner = None
+        failed = 0
+        try:
+            while True:
+                timeout = None if hedged or winner is not None else max(0.0, hedge_at - loop.time())
+                try:
+                    index, kind, value = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    hedged = True
+                    try:
+                        launch(backup())
+                    except Exception as e:
+                        logging.warning(f"Could not start hedge request for {models[0]}: {e}")
+                        continue
+                    self.hedging.add(fired=1)
+                    logging.debug(f"No first token from {models[0]} after {loop.time() - started:.2f}s, hedging to {models[-1]}")
+                    continue
+
+                if winner is None:
+                    if kind == _ERROR:
+                        failed += 1
+                        if failed < len(attempts):
+                            continue  # the other attempt may still answer
+                    else:
+                        winner = index
+                        for i, attempt in enumerate(attempts):
+                            if i != winner:
+                                attempt.cancel()
+                        if len(attempts) > 1:
+                            self._hedge_won(models, winner, loop.time() - started)
+                elif index != winner:
+                    continue
+
+                emit(kind, value)
+                if kind != _CHUNK:
+                    return
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def _hedge_won(self, models, winner: int, elapsed: float) -> None:
+        if winner == 0:
+            self.hedging.add(primary_wins=1)
+            return
+        # The primary had not answered after `elapsed`; estimate when it would
+        # have from its past first tokens that were at least that slow.
+        self._router.record_slow(models[0], elapsed)
+        expected = self._router.ttft_mean_above(models[0], elapsed)
+        self.hedging.add(backup_wins=1, saved_seconds=max(0.0, (expected or elapsed) - elapsed))
+
+    def complete(
+        self,
+        provider: str,
+        config: Dict[str, Optional[str]],
+        params: Dict[str, Any],
+        timeout: Optional[float] = None,
+        purpose: str = "",
+    ) -> str:
+        """Run a non-streaming chat completion and return the message content."""
+        future = self._submit(self._complete(provider, config, params, purpose))
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stream(
+        self,
+        provider: str,
+        config: Dict[str, Optional[str]],
+        params: Dict[str, Any],
+        purpose: str = "",
+        background: bool = False,
+    ) -> Iterator[str]:
+        """Stream a chat completion as content chunks. Provider errors are re-raised here."""
+        out: queue.SimpleQueue = queue.SimpleQueue()
+        future = self._submit(self._queued(
+            lambda emit: self._attempt(provider, config, params, emit, purpose, background), out
+        ))
+        yield from self._drain(out, future, f"{provider}/{params.get('model')}")
+
+    def stream_hedged(
+        self,
+        provider: str,
+        config: Dict[str, Optional[str]],
+        params: Dict[str, Any],
+        backup: Callable[[], Target],
+        purpose: str = "",
+        background: bool = False,
+    ) -> Iterator[str]:
+        """
+        Like stream(), but hedged: `backup` is called (on the gateway loop) to
+        get the second request if the first one is slow to start.
+        """
+        out: queue.SimpleQueue = queue.SimpleQueue()
+        future = self._submit(self._queued(
+            lambda emit: self._stream_hedged((provider, config, params), backup, emit, purpose, background), out
+        ))
+        yield from self._drain(out, future, f"{provider}/{params.get('model')}")
+
+    def stream_shared(
+        self,
+        key: str,
+        target: Callable[[], Target],
+        backup: Optional[Callable[[], Target]] = None,
+        on_complete: Optional[Callable[[str], None]] = None,
+        purpose: str = "",
+        background: bool = False,
+    ) -> Iterator[str]:
+        """
+        Like stream() (or stream_hedged() when `backup` is given), coalesced
+        on `key`. `target` is only called when no stream for the key is
+        running, and `background` only applies to the stream it starts.
+        on_complete runs on the gateway loop and should be quick; that of
+        every reader that joined the stream is called.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                provider, config, params = target()
+                flight = self._flights[key] = _Flight()
+                emit = lambda kind, value: self._publish(key, flight, kind, value)
+                if backup is None:
+                    coro = self._attempt(provider, config, params, emit, purpose, background)
+                else:
+                    coro = self._stream_hedged((provider, config, params), backup, emit, purpose, background)
+                flight.future = self._submit(coro)
+                self.coalescing.add(flights=1)
+            else:
+                self.coalescing.add(followers=1)
+            flight.readers += 1
+            if on_complete is not None:
+                flight.callbacks.append(on_complete)
+        yield from self._follow(key, flight)
+
+    def _publish(self, key: str, flight: _Flight, kind: str, value: Any) -> None:
+        with flight.cond:
+            if kind == _CHUNK:
+                flight.chunks.append(value)
+            else:
+                flight.done = True
+                flight.error = value if kind == _ERROR else None
+            flight.cond.notify_all()
+        if kind == _CHUNK:
+            return
+        with self._flights_lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            # No reader can join once the flight is out of the map
+            callbacks = list(flight.callbacks)
+        if kind != _DONE:
+            return
+        text = "".join(flight.chunks)
+        for on_complete in callbacks:
+            try:
+                on_complete(text)
+            except Exception as e:
+                logging.error(f"on_complete failed for shared stream {key}: {e}")
+
+    def _follow(self, key: str, flight: _Flight) -> Iterator[str]:
+        """Replay the flight's chunks so far, then the live ones."""
+        index = 0
+        try:
+            while True:
+                with flight.cond:
+                    while index == len(flight.chunks) and not flight.done:
+                        flight.cond.wait()
+                    pending = flight.chunks[index:]
+                    index += len(pending)
+                    done, error = flight.done, flight.error
+                yield from pending
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._flights_lock:
+                flight.readers -= 1
+                if flight.readers == 0 and not flight.done:
+                    # Every reader went away; stop the upstream request
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                    flight.future.cancel()
+                    self.coalescing.add(abandoned=1)
+
+    def _drain(self, out: queue.SimpleQueue, future, label: str) -> Iterator[str]:
+        try:
+            while True:
+                kind, value = out.get()
+                if kind == _CHUNK:
+                    yield value
+                elif kind == _ERROR:
+                    raise value
+                else:
+                    return
+        finally:
+            if not future.done():
+                # The reader went away (e.g. the client closed the SSE connection)
+                logging.debug(f"Cancelling abandoned stream for {label}")
+                future.cancel()
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,203 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from utils.analysis_prompt import estimate_tokens
+from utils.model_router import RollingWindow
+
+SeriesKey = Tuple[str, str, str]  # (purpose, provider, model)
+
+# The call being measured in the current thread or asyncio task, so the HTTP
+# client hooks can count the requests (and so the retries) it makes
+_current_call: contextvars.ContextVar = contextvars.ContextVar("llm_call", default=None)
+
+
+class LLMCall:
+    """Measurements of one LLM call, filled in by the caller while it runs."""
+
+    def __init__(self, purpose: str, provider: str, model: str) -> None:
+        self.purpose = purpose
+        self.provider = provider
+        self.model = model
+        self.started = time.monotonic()
+        self.ttft: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.http_requests = 0
+        self.retried = False
+        self.estimated = False
+
+    def first_token(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+    def usage(self, usage: Any) -> None:
+        """Take token counts from an OpenAI-style `usage` object, if the provider sent one."""
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+    def estimate_usage(self, messages: Sequence[Dict[str, Any]], output: str) -> None:
+        """
+        Estimate token counts from the request's text and the output, when
+        the provider sent no usage (see utils.analysis_prompt.estimate_tokens).
+        Image parts are not counted.
+        """
+        if self.completion_tokens is not None:
+            return
+        texts = []
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                texts.append(content)
+            elif isinstance(content, list):
+                texts.extend(part.get("text", "") for part in content if isinstance(part, dict))
+        self.prompt_tokens = estimate_tokens("\n".join(texts))
+        self.completion_tokens = estimate_tokens(output)
+        self.estimated = True
+
+
+class _Series:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_calls = 0
+        self.cost = 0.0
+        self.last_error: Optional[str] = None
+        self.ttft = RollingWindow(500)
+        self.duration = RollingWindow(500)
+
+    def as_dict(self) -> Dict[str, Any]:
+        def percentiles(window: RollingWindow) -> Dict[str, Optional[float]]:
+            return {
+                name: None if value is None else round(value * 1000, 1)
+                for name, value in (
+                    ("p50", window.percentile(50)),
+                    ("p90", window.percentile(90)),
+                    ("p99", window.percentile(99)),
+                )
+            }
+
+        finished = self.calls - self.cancelled
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / finished, 4) if finished else 0.0,
+            "cancelled": self.cancelled,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_token_calls": self.estimated_calls,
+            "cost_usd": round(self.cost, 6),
+            "ttft_ms": percentiles(self.ttft),
+            "duration_ms": percentiles(self.duration),
+            "last_error": self.last_error,
+        }
+
+
+class LLMMetrics:
+    """
+    In-process registry of LLM call measurements, labelled by purpose (the
+    model list, e.g. HINT_MODELS), provider and model.
+
+    Counters (calls, errors, cancellations, retries, tokens, cost) cover the
+    whole process lifetime; time to first token and total duration are kept
+    as rolling windows of the latest calls and reported as percentiles.
+    Cost uses LLM_PRICING, a JSON object of USD per million tokens:
+
+        LLM_PRICING={"GEMINI/gemini-2.0-flash": {"input": 0.1, "output": 0.4}}
+
+    Retries are the extra HTTP requests the client made for one call (see
+    count_http_request), plus calls the caller marks as a retry. Calls whose
+    provider sent no usage count estimated tokens (LLMCall.estimate_usage);
+    estimated_token_calls says how many.
+    """
+
+    def __init__(self) -> None:
+        self._series: Dict[SeriesKey, _Series] = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._pricing_source: Optional[str] = None
+        self._pricing: Dict[str, Dict[str, float]] = {}
+
+    def _price(self, provider: str, model: str) -> Dict[str, float]:
+        source = os.getenv("LLM_PRICING", "")
+        if source != self._pricing_source:
+            try:
+                self._pricing = json.loads(source) if source else {}
+            except json.JSONDecodeError as e:
+                logging.error(f"Invalid LLM_PRICING: {e}")
+                self._pricing = {}
+            self._pricing_source = source
+        return self._pricing.get(f"{provider}/{model}", {})
+
+    @contextmanager
+    def track(self, purpose: str, provider: str, model: str, retry: bool = False) -> Iterator[LLMCall]:
+        """Measure one call; the block may report first_token() and usage() on the yielded LLMCall."""
+        call = LLMCall(purpose, provider, model)
+        call.retried = retry
+        token = _current_call.set(call)
+        error: Optional[BaseException] = None
+        try:
+            yield call
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_call.reset(token)
+            self._record(call, time.monotonic() - call.started, error)
+
+    def _record(self, call: LLMCall, duration: float, error: Optional[BaseException]) -> None:
+        price = self._price(call.provider, call.model)
+        with self._lock:
+            series = self._series.get((call.purpose, call.provider, call.model))
+            if series is None:
+                series = self._series[(call.purpose, call.provider, call.model)] = _Series()
+            series.calls += 1
+            series.retries += max(0, call.http_requests - 1) + (1 if call.retried else 0)
+            if error is not None and not isinstance(error, Exception):
+                # Cancelled (hedge loser, abandoned stream) or interrupted
+                series.cancelled += 1
+            elif error is not None:
+                series.errors += 1
+                series.last_error = f"{type(error).__name__}: {error}"[:300]
+            else:
+                series.duration.add(duration)
+                if call.ttft is not None:
+                    series.ttft.add(call.ttft)
+            if call.estimated:
+                series.estimated_calls += 1
+            if call.prompt_tokens:
+                series.prompt_tokens += call.prompt_tokens
+                series.cost += call.prompt_tokens * price.get("input", 0.0) / 1e6
+            if call.completion_tokens:
+                series.completion_tokens += call.completion_tokens
+                series.cost += call.completion_tokens * price.get("output", 0.0) / 1e6
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            series = [
+                dict(purpose=purpose, provider=provider, model=model, **s.as_dict())
+                for (purpose, provider, model), s in sorted(self._series.items())
+            ]
+        return {"since": self._started, "series": series}
+
+
+def count_http_request() -> None:
+    """Called by the LLM HTTP clients for every request they send."""
+    call = _current_call.get()
+    if call is not None:
+        call.http_requests += 1
+
+
+llm_metrics = LLMMetrics()
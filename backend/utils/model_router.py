@@ -0,0 +1,264 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Sequence
+
+# Assumed for a model until it has answered at least once
+DEFAULT_TTFT = 1.0              # seconds to first token
+DEFAULT_THROUGHPUT = 200.0      # output characters per second
+# Typical hint/solution length, used to weigh throughput against TTFT
+EXPECTED_OUTPUT_CHARS = 600
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RollingWindow:
+    """The last `size` samples of a measurement, for percentiles."""
+
+    def __init__(self, size: int = 100) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, value: float) -> None:
+        self._samples.append(value)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def mean_above(self, threshold: float) -> Optional[float]:
+        above = [v for v in self._samples if v > threshold]
+        return sum(above) / len(above) if above else None
+
+
+class ModelStats:
+    """EWMA latency/throughput/error figures and circuit state for one model."""
+
+    def __init__(self) -> None:
+        self.ttft: Optional[float] = None
+        self.throughput: Optional[float] = None
+        self.ttft_window = RollingWindow()
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.probe_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "ttft": self.ttft,
+            "throughput": self.throughput,
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "state": self.state,
+            "cooldown": self.cooldown,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRouter:
+    """
+    Picks one model out of a configured list ("PROVIDER/model" names) by
+    weighted random choice, where a model's weight is
+
+        (1 - error_rate)^2 / (ttft + EXPECTED_OUTPUT_CHARS / throughput)
+
+    from exponentially weighted averages of its recent calls. Faster and more
+    reliable models get more traffic, but every healthy model keeps a share
+    (`explore`) so its figures stay current.
+
+    Each model has a circuit breaker: after `failure_threshold` consecutive
+    failures it is skipped for a cooldown that doubles on every failed probe
+    (up to `max_cooldown`). Once the cooldown has passed the circuit is
+    half-open and exactly one request is let through as a probe; success
+    closes it again. If every candidate is open the one that has been open
+    longest is used, so a single-model list never stops working.
+
+    Outcomes are reported with record_success()/record_failure(); the gateway
+    does that for every call it runs.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.2,
+        failure_threshold: int = 3,
+        base_cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        explore: float = 0.05,
+        history: int = 200,
+    ) -> None:
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.explore = explore
+        self._stats: Dict[str, ModelStats] = {}
+        self._decisions: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats()
+        return stats
+
+    def _ewma(self, old: Optional[float], value: float) -> float:
+        return value if old is None else old + self.alpha * (value - old)
+
+    def _weight(self, stats: ModelStats) -> float:
+        ttft = stats.ttft if stats.ttft is not None else DEFAULT_TTFT
+        throughput = stats.throughput if stats.throughput is not None else DEFAULT_THROUGHPUT
+        expected_time = ttft + EXPECTED_OUTPUT_CHARS / max(throughput, 1.0)
+        return (1.0 - stats.error_rate) ** 2 / max(expected_time, 0.01)
+
+    def _available(self, stats: ModelStats, now: float) -> bool:
+        """Whether a request may go to this model now; claims the probe slot when half-open."""
+        if stats.state == CLOSED:
+            return True
+        if stats.state == OPEN and now - stats.opened_at >= stats.cooldown:
+            stats.state = HALF_OPEN
+            stats.probe_started = None
+        if stats.state == HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) frees the slot after a cooldown
+            if stats.probe_started is None or now - stats.probe_started >= stats.cooldown:
+                return True
+        return False
+
+    def choose(self, candidates: Sequence[str], purpose: str = "", exclude: Iterable[str] = ()) -> str:
+        """
+        Pick a model from `candidates`, recording the decision for snapshot().
+        Models in `exclude` are only used when nothing else is configured.
+        """
+        if not candidates:
+            raise ValueError("No models to choose from")
+        now = time.monotonic()
+        with self._lock:
+            unique = list(dict.fromkeys(candidates))
+            excluded = set(exclude)
+            unique = [m for m in unique if m not in excluded] or unique
+            weights: Dict[str, float] = {}
+            for model in unique:
+                stats = self._get(model)
+                if self._available(stats, now):
+                    weights[model] = self._weight(stats)
+
+            if weights:
+                total = sum(weights.values())
+                floor = self.explore * total / len(weights)
+                models = list(weights)
+                chosen = random.choices(models, [max(weights[m], floor) for m in models])[0]
+            else:
+                chosen = min(unique, key=lambda m: self._stats[m].opened_at)
+                logging.warning(f"All models open for {purpose or 'request'}, falling back to {chosen}")
+
+            stats = self._stats[chosen]
+            if stats.state == HALF_OPEN:
+                stats.probe_started = now
+            self._decisions.append({
+                "time": time.time(),
+                "purpose": purpose,
+                "chosen": chosen,
+                "weights": {m: round(w, 4) for m, w in weights.items()},
+                "skipped": [m for m in unique if m not in weights],
+            })
+        return chosen
+
+    def record_success(
+        self,
+        model: str,
+        duration: float,
+        ttft: Optional[float] = None,
+        output_chars: int = 0,
+    ) -> None:
+        """
+        Report a finished call. `ttft` is only known for streamed calls; the
+        throughput sample is taken over the time after the first token.
+        """
+        with self._lock:
+            stats = self._get(model)
+            stats.requests += 1
+            stats.error_rate = self._ewma(stats.error_rate, 0.0)
+            if ttft is not None:
+                stats.ttft = self._ewma(stats.ttft, ttft)
+                stats.ttft_window.add(ttft)
+            generating = duration - (ttft or 0.0)
+            if output_chars and generating > 0:
+                stats.throughput = self._ewma(stats.throughput, output_chars / generating)
+            stats.consecutive_failures = 0
+            if stats.state != CLOSED:
+                logging.info(f"Model {model} recovered, closing circuit")
+            stats.state = CLOSED
+            stats.cooldown = 0.0
+            stats.probe_started = None
+
+    def record_slow(self, model: str, waited: float) -> None:
+        """
+        A call was abandoned after `waited` seconds without a first token
+        (e.g. it lost a hedge). Counted as a TTFT of at least that long so
+        the model is not mistaken for a fast one; not counted as an error.
+        """
+        with self._lock:
+            stats = self._get(model)
+            stats.ttft = self._ewma(stats.ttft, waited)
+            stats.ttft_window.add(waited)
+
+    def ttft_percentile(self, model: str, pct: float, min_samples: int = 20) -> Optional[float]:
+        """TTFT percentile over the model's recent streams, or None with too few samples."""
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None or len(stats.ttft_window) < min_samples:
+                return None
+            return stats.ttft_window.percentile(pct)
+
+    def ttft_mean_above(self, model: str, threshold: float) -> Optional[float]:
+        """Mean of the model's recent TTFTs that exceeded `threshold`, if any."""
+        with self._lock:
+            stats = self._stats.get(model)
+            return stats.ttft_window.mean_above(threshold) if stats else None
+
+    def record_failure(self, model: str, error: BaseException) -> None:
+        with self._lock:
+            stats = self._get(model)
+            stats.requests += 1
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.error_rate = self._ewma(stats.error_rate, 1.0)
+            stats.last_error = f"{type(error).__name__}: {error}"[:300]
+            if stats.state == HALF_OPEN or stats.consecutive_failures >= self.failure_threshold:
+                if stats.state == HALF_OPEN:
+                    stats.cooldown = min(stats.cooldown * 2, self.max_cooldown)
+                else:
+                    stats.cooldown = stats.cooldown or self.base_cooldown
+                stats.state = OPEN
+                stats.opened_at = time.monotonic()
+                stats.probe_started = None
+                logging.warning(f"Opening circuit for {model} for {stats.cooldown:.0f}s: {stats.last_error}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current per-model figures and the most recent routing decisions."""
+        with self._lock:
+            return {
+                "models": {
+                    model: dict(stats.as_dict(), weight=round(self._weight(stats), 4))
+                    for model, stats in self._stats.items()
+                },
+                "decisions": list(self._decisions),
+            }
+
+
+model_router = ModelRouter()
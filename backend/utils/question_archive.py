@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+
+QUESTION_ARCHIVE_FILENAME = "question_archive.jsonl"
+
+
+def superseded_questions(
+    old_lessons: Mapping[Tuple, Sequence[dict]],
+    new_lessons: Mapping[Tuple, Sequence[dict]],
+) -> Iterator[dict]:
+    """Questions of `old_lessons` whose qid no longer exists in `new_lessons` (edited or removed)."""
+    for key, old in old_lessons.items():
+        current = {q["qid"] for q in new_lessons.get(key, ())}
+        for q in old:
+            if q["qid"] not in current:
+                yield q
+
+
+class QuestionArchive:
+    """
+    Append-only JSON Lines file of bank questions that an edit or removal
+    took out of the bank, keyed by their qid. Exams keep referencing the
+    qid they were generated with, so hydration looks a question up here when
+    the current bank no longer has it. Each qid is written once.
+
+    The file is read on first use and re-read whenever it changes, so
+    questions archived by another process (or by compile_question_bank.py)
+    are seen too.
+    """
+
+    def __init__(self, data_dir: str) -> None:
+        self.path = os.path.join(data_dir, QUESTION_ARCHIVE_FILENAME)
+        self._questions: Dict[str, dict] = {}
+        self._stat: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._questions, self._stat = {}, None
+            return
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat == self._stat:
+            return
+        questions: Dict[str, dict] = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    question = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash while appending
+                    logging.warning(f"Skipping unreadable line in {self.path}")
+                    continue
+                questions.setdefault(question["qid"], question)
+        self._questions, self._stat = questions, stat
+
+    def get(self, qid: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self._questions.get(qid)
+
+    def add(self, questions: Iterable[dict]) -> int:
+        """Archive the questions whose qid is not archived yet; returns how many were written."""
+        with self._lock:
+            self._refresh()
+            new: Dict[str, dict] = {}
+            for q in questions:
+                if q["qid"] not in self._questions and q["qid"] not in new:
+                    new[q["qid"]] = dict(q)
+            if not new:
+                return 0
+            # One write per call, so appends from several processes do not interleave
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(q, ensure_ascii=False) + "\n" for q in new.values()))
+            self._questions.update(new)
+        return len(new)
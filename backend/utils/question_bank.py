@@ -0,0 +1,359 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils.compiled_bank import COMPILED_BANK_FILENAME, MappedBank
+from utils.duplicate_index import DUPLICATE_INDEX_FILENAME, load_duplicate_index
+from utils.generate_utils import parse_questions_from_json
+from utils.question_archive import QuestionArchive, superseded_questions
+
+# (standard, subject folder, lesson file stem), e.g. (9, "math", "lesson1")
+LessonKey = Tuple[int, str, str]
+
+DATA_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+)
+LESSON_FOLDERS = {"lessons": 9, "lessons10": 10}
+
+
+def lesson_key_from_path(file_path: str) -> Optional[LessonKey]:
+    """
+    Map a lesson file path (as built by lesson2filepath) to its bank key.
+    Subject and file name are lower-cased: lesson2filepath builds names such
+    as "ss/H.1.json" for the file "h.1.json", which opened fine on
+    case-insensitive filesystems.
+    """
+    parts = os.path.normpath(file_path).split(os.sep)
+    if len(parts) < 3:
+        return None
+    folder, subject, filename = parts[-3:]
+    standard = LESSON_FOLDERS.get(folder)
+    if standard is None or not filename.endswith(".json"):
+        return None
+    return standard, subject.lower(), filename[: -len(".json")].lower()
+
+
+def is_valid_question(question) -> bool:
+    """A question is usable if it has text, exactly four options and a known answer."""
+    if not isinstance(question, dict) or not question.get("question"):
+        return False
+    options = question.get("options")
+    if not isinstance(options, dict) or len(options) != 4:
+        return False
+    return question.get("answer") in options
+
+
+def content_hash(text: str) -> str:
+    """Short, stable hash of a piece of question content (whitespace/case-insensitive)."""
+    normalized = " ".join(text.split()).lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def question_content_hash(question: dict) -> str:
+    """Hash of a question's text and option values, independent of option order."""
+    values = sorted(str(v) for v in question["options"].values())
+    return content_hash("\x1f".join([question["question"], *values]))
+
+
+def lesson_id(key: LessonKey) -> str:
+    """String form of a lesson key, e.g. "9/math/lesson1"."""
+    standard, subject, lesson = key
+    return f"{standard}/{subject}/{lesson}"
+
+
+def make_question_id(key: LessonKey, digest: str) -> str:
+    return f"{lesson_id(key)}/{digest}"
+
+
+def lesson_key_from_question_id(qid: str) -> Optional[LessonKey]:
+    parts = qid.split("/") if isinstance(qid, str) else []
+    if len(parts) != 4 or not parts[0].isdigit():
+        return None
+    return int(parts[0]), parts[1], parts[2]
+
+
+def assign_question_ids(key: LessonKey, questions: Sequence[dict]) -> Tuple[dict, ...]:
+    """
+    Return copies of the questions carrying a permanent "qid" built from the
+    lesson key and the question's content hash. Exact duplicates inside a
+    lesson get an occurrence suffix so every ID stays unique.
+    """
+    seen: Dict[str, int] = {}
+    result = []
+    for q in questions:
+        digest = question_content_hash(q)
+        seen[digest] = seen.get(digest, 0) + 1
+        if seen[digest] > 1:
+            digest = f"{digest}-{seen[digest]}"
+        result.append(dict(q, qid=make_question_id(key, digest)))
+    return tuple(result)
+
+
+def lesson_signature(questions: Sequence[dict]) -> str:
+    """
+    Hash of a lesson's question IDs in order. It changes whenever a question
+    is edited, added, removed or moved, i.e. whenever positions in the lesson
+    stop meaning the same questions.
+    """
+    return hashlib.sha1("\n".join(q["qid"] for q in questions).encode("utf-8")).hexdigest()[:12]
+
+
+def lesson_source_files(data_dir: str = DATA_DIR) -> Iterator[str]:
+    """Yield every data/lessons*/<subject>/*.json file in a stable order."""
+    for folder in LESSON_FOLDERS:
+        folder_path = os.path.join(data_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for subject in sorted(os.listdir(folder_path)):
+            subject_path = os.path.join(folder_path, subject)
+            if not os.path.isdir(subject_path):
+                continue
+            for filename in sorted(os.listdir(subject_path)):
+                if filename.endswith(".json"):
+                    yield os.path.join(subject_path, filename)
+
+
+def load_lessons_from_disk(data_dir: str = DATA_DIR) -> Dict[LessonKey, Tuple[dict, ...]]:
+    """Read every lesson JSON file into per-lesson tuples of valid, ID-tagged questions."""
+    lessons: Dict[LessonKey, Tuple[dict, ...]] = {}
+    for file_path in lesson_source_files(data_dir):
+        raw = parse_questions_from_json(file_path) or []
+        questions = [q for q in raw if is_valid_question(q)]
+        if len(questions) != len(raw):
+            logging.warning(
+                f"Skipped {len(raw) - len(questions)} malformed questions in {file_path}"
+            )
+        key = lesson_key_from_path(file_path)
+        lessons[key] = assign_question_ids(key, questions)
+    return lessons
+
+
+def source_signature(data_dir: str = DATA_DIR) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    (path, mtime_ns, size) of every file a snapshot is built from: lesson
+    files, the compiled bank and the duplicate index. Cheap enough to poll.
+    """
+    paths = list(lesson_source_files(data_dir))
+    paths += [
+        os.path.join(data_dir, COMPILED_BANK_FILENAME),
+        os.path.join(data_dir, DUPLICATE_INDEX_FILENAME),
+    ]
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def load_lessons(data_dir: str = DATA_DIR) -> Dict[LessonKey, Sequence[dict]]:
+    """
+    Prefer the compiled, memory-mapped bank (see processing/compile_question_bank.py)
+    when it is at least as new as every lesson file; otherwise parse the JSON.
+    """
+    compiled_path = os.path.join(data_dir, COMPILED_BANK_FILENAME)
+    if os.path.exists(compiled_path):
+        newest_source = max(
+            (os.path.getmtime(p) for p in lesson_source_files(data_dir)), default=0
+        )
+        if os.path.getmtime(compiled_path) >= newest_source:
+            try:
+                return MappedBank(compiled_path).lessons()
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not map compiled question bank {compiled_path}: {e}")
+        else:
+            logging.warning(
+                f"{compiled_path} is older than the lesson files, loading JSON instead. "
+                "Re-run processing/compile_question_bank.py to rebuild it."
+            )
+    return load_lessons_from_disk(data_dir)
+
+
+class BankSnapshot:
+    """One consistent, immutable view of the bank's lessons plus a lazy ID index."""
+
+    def __init__(
+        self,
+        lessons: Dict[LessonKey, Sequence[dict]],
+        clusters: Optional[Dict[str, str]] = None,
+        signature: Tuple = (),
+        generation: int = 0,
+        archive: Optional[QuestionArchive] = None,
+    ) -> None:
+        self.lessons = lessons
+        self.clusters = clusters
+        self.signature = signature
+        self.generation = generation
+        self.archive = archive
+        self._id_index: Dict[LessonKey, Dict[str, int]] = {}
+        self._signatures: Dict[LessonKey, str] = {}
+        self._lock = threading.Lock()
+
+    def get_lesson(self, key: LessonKey) -> Sequence[dict]:
+        return self.lessons.get(key, ())
+
+    def lesson_signature(self, key: LessonKey) -> str:
+        """See lesson_signature(); computed once per lesson and snapshot."""
+        signature = self._signatures.get(key)
+        if signature is None:
+            signature = self._signatures[key] = lesson_signature(self.get_lesson(key))
+        return signature
+
+    def index_of(self, qid: str) -> Optional[Tuple[LessonKey, int]]:
+        """Locate a question ID as (lesson key, index within the lesson)."""
+        key = lesson_key_from_question_id(qid)
+        if key is None or key not in self.lessons:
+            return None
+        index = self._id_index.get(key)
+        if index is None:
+            with self._lock:
+                index = self._id_index.get(key)
+                if index is None:
+                    index = {q["qid"]: i for i, q in enumerate(self.lessons[key])}
+                    self._id_index[key] = index
+        position = index.get(qid)
+        return None if position is None else (key, position)
+
+    def get_question(self, qid: str) -> Optional[dict]:
+        location = self.index_of(qid)
+        if location is None:
+            return None
+        key, position = location
+        return self.lessons[key][position]
+
+    def find_question(self, qid: str) -> Optional[dict]:
+        """get_question(), falling back to the archive of edited and removed questions."""
+        question = self.get_question(qid)
+        if question is None and self.archive is not None:
+            question = self.archive.get(qid)
+        return question
+
+    def dedupe_key(self, question: dict) -> str:
+        """
+        Key under which an exam may hold at most one question: the question's
+        near-duplicate cluster from the offline index, or its normalised text
+        when the index has not been built or predates the question.
+        """
+        cluster = self.clusters.get(question["qid"]) if self.clusters is not None else None
+        if cluster is None:
+            return " ".join(question["question"].lower().split())
+        return cluster
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.lessons.values())
+
+
+class QuestionBank:
+    """
+    Read-only, in-memory index of every lesson's questions.
+
+    Lesson files are loaded once (on load() or first access) and kept as
+    immutable per-lesson sequences keyed by (standard, subject, lesson),
+    either parsed JSON tuples or lazy views over the compiled mmap bank.
+    Every question carries a permanent "qid" derived from its lesson and
+    content. Callers must not mutate the returned question dicts; copy them
+    first, and take one snapshot() per request for a consistent view.
+
+    reload_if_changed() swaps in a rebuilt snapshot when the source files
+    change. Requests holding the old snapshot keep using it; it is freed
+    once the last of them finishes. Questions the reload edited or removed
+    are archived first (utils.question_archive), so exams generated from
+    them can still be resolved by their old qid.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR) -> None:
+        self.data_dir = data_dir
+        self.archive = QuestionArchive(data_dir)
+        self._snapshot: Optional[BankSnapshot] = None
+        self._pending_signature: Optional[Tuple] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def _build_snapshot(self, signature: Optional[Tuple] = None) -> BankSnapshot:
+        # Take the signature first so a change made while loading is picked up next time
+        if signature is None:
+            signature = source_signature(self.data_dir)
+        self._generation += 1
+        return BankSnapshot(
+            load_lessons(self.data_dir),
+            load_duplicate_index(self.data_dir),
+            signature=signature,
+            generation=self._generation,
+            archive=self.archive,
+        )
+
+    def load(self, signature: Optional[Tuple] = None) -> None:
+        """(Re)load all lesson files and swap them in atomically."""
+        with self._reload_lock:
+            previous = self._snapshot
+            snapshot = self._build_snapshot(signature)
+            if previous is not None:
+                self._archive_superseded(previous, snapshot)
+            with self._lock:
+                self._snapshot = snapshot
+        logging.info(
+            f"Question bank loaded (generation {snapshot.generation}): "
+            f"{len(snapshot.lessons)} lessons, {len(snapshot)} questions"
+        )
+
+    def _archive_superseded(self, previous: BankSnapshot, snapshot: BankSnapshot) -> None:
+        try:
+            archived = self.archive.add(superseded_questions(previous.lessons, snapshot.lessons))
+        except OSError as e:
+            logging.error(f"Could not archive replaced questions in {self.archive.path}: {e}")
+            return
+        if archived:
+            logging.info(f"Archived {archived} edited or removed questions")
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload when the source files differ from the current snapshot's and
+        have not changed since the previous call, so files still being
+        written are never loaded half-way. Meant to be polled periodically.
+        Returns True when a new snapshot was swapped in.
+        """
+        signature = source_signature(self.data_dir)
+        if signature == self.snapshot().signature:
+            self._pending_signature = None
+            return False
+        if signature != self._pending_signature:
+            self._pending_signature = signature
+            return False
+        self._pending_signature = None
+        self.load(signature)
+        return True
+
+    def snapshot(self) -> BankSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build_snapshot()
+                snapshot = self._snapshot
+        return snapshot
+
+    def get_lesson(self, key: LessonKey) -> Sequence[dict]:
+        return self.snapshot().get_lesson(key)
+
+    def get_lesson_for_path(self, file_path: str) -> Sequence[dict]:
+        key = lesson_key_from_path(file_path)
+        if key is None:
+            return ()
+        return self.get_lesson(key)
+
+    def get_question(self, qid: str) -> Optional[dict]:
+        return self.snapshot().get_question(qid)
+
+    def lesson_keys(self) -> List[LessonKey]:
+        return list(self.snapshot().lessons.keys())
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+
+question_bank = QuestionBank()
@@ -0,0 +1,86 @@
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def allocate_per_lesson(sizes: np.ndarray, num_questions: int) -> np.ndarray:
+    """
+    Split num_questions across lessons in proportion to their sizes. Rounding
+    drift is absorbed by the lesson with the largest share (first one on ties).
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    counts = np.rint(sizes / sizes.sum() * num_questions).astype(np.int64)
+    counts[np.argmax(counts)] += num_questions - counts.sum()
+    return counts
+
+
+def sample_available(mask: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Sample up to k distinct indexes where mask is True, without replacement.
+
+    While most of the lesson is still available this draws random positions
+    and rejects used ones, so the work is proportional to k rather than to the
+    lesson size; otherwise it samples from the explicit list of free indexes.
+    """
+    n = mask.size
+    available = int(np.count_nonzero(mask))
+    k = min(k, available)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if available >= 2 * k:
+        picked = np.empty(0, dtype=np.int64)
+        while picked.size < k:
+            draws = rng.integers(0, n, size=2 * (k - picked.size) + 8)
+            draws = draws[mask[draws]]
+            candidates = np.concatenate([picked, draws])
+            _, first = np.unique(candidates, return_index=True)
+            picked = candidates[np.sort(first)]
+        return picked[:k]
+
+    return rng.choice(np.flatnonzero(mask), size=k, replace=False)
+
+
+def select_questions(
+    lessons: Sequence[Sequence[dict]],
+    masks: Sequence[np.ndarray],
+    num_questions: int,
+    dedupe_key: Callable[[dict], Hashable],
+    rng: Optional[np.random.Generator] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Pick num_questions as (lesson number, question index) pairs, proportional
+    to lesson sizes, only from positions whose mask entry is True and never two
+    questions with the same dedupe_key. Slots a lesson cannot fill are topped
+    up from the other lessons. The result is in random order.
+    """
+    rng = rng or np.random.default_rng()
+    sizes = np.array([len(questions) for questions in lessons])
+    targets = allocate_per_lesson(sizes, num_questions)
+    remaining = [np.array(mask, dtype=bool) for mask in masks]
+    seen = set()
+    picks: List[Tuple[int, int]] = []
+
+    def fill(lesson: int, need: int) -> int:
+        questions, mask = lessons[lesson], remaining[lesson]
+        while need > 0:
+            drawn = sample_available(mask, need, rng)
+            if not drawn.size:
+                break
+            mask[drawn] = False
+            for position in drawn:
+                key = dedupe_key(questions[position])
+                if key in seen:
+                    continue
+                seen.add(key)
+                picks.append((lesson, int(position)))
+                need -= 1
+        return need
+
+    shortfall = sum(fill(lesson, int(target)) for lesson, target in enumerate(targets))
+    for lesson in rng.permutation(len(lessons)):
+        if shortfall <= 0:
+            break
+        shortfall = fill(int(lesson), shortfall)
+
+    return [picks[i] for i in rng.permutation(len(picks))]
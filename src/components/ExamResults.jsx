@@ -1385,6 +1385,45 @@ const ExamResults = ({ onTaskCompletion }) => {
     fetchResults();
   }, [id, navigate, location.state]);
 
+  // The analysis is written by a background job after submission; poll until it is ready
+  const analysisStatus = examData?.performance_analysis
+    ? 'done'
+    : examData?.performance_analysis_status;
+  useEffect(() => {
+    if (analysisStatus !== 'pending') return;
+
+    let cancelled = false;
+    let timeoutId;
+    let attempts = 0;
+    const poll = async () => {
+      try {
+        const data = await api.getPerformanceAnalysis(id);
+        if (cancelled) return;
+        if (data.status !== 'pending') {
+          setExamData(prev => ({
+            ...prev,
+            performance_analysis: data.performance_analysis,
+            performance_analysis_status: data.status
+          }));
+          return;
+        }
+      } catch (error) {
+        console.error('Error fetching performance analysis:', error);
+      }
+      attempts += 1;
+      // Back off from 2s to 10s between checks; give up after about 10 minutes
+      if (!cancelled && attempts < 60) {
+        timeoutId = setTimeout(poll, Math.min(2000 * attempts, 10000));
+      }
+    };
+    timeoutId = setTimeout(poll, 2000);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timeoutId);
+    };
+  }, [id, analysisStatus]);
+
   const toggleSolution = (questionNo, questionIndex) => {
     // If solution is already visible, hide it
     if (visibleSolutions[questionNo]) {
@@ -1652,6 +1691,28 @@ const ExamResults = ({ onTaskCompletion }) => {
           <PerformanceAnalysis analysis={examData.performance_analysis} />
         )}
 
+        {analysisStatus === 'pending' && (
+          <AutoGenerateNotification
+            initial={{ opacity: 0, y: -10 }}
+            animate={{ opacity: 1, y: 0 }}
+          >
+            <motion.div
+              animate={{ rotate: 360 }}
+              transition={{ duration: 1, repeat: Infinity, ease: "linear" }}
+            >
+              <AiOutlineLoading3Quarters />
+            </motion.div>
+            Preparing your performance analysis...
+          </AutoGenerateNotification>
+        )}
+
+        {analysisStatus === 'failed' && (
+          <AutoGenerateNotification initial={{ opacity: 0 }} animate={{ opacity: 1 }}>
+            <FaExclamationTriangle />
+            Performance analysis is unavailable for this exam right now.
+          </AutoGenerateNotification>
+        )}
+
         {results.map((result, index) => {
           const questionData = examData.questions.find(q => q.question === result.question);
           const questionNo = result['question-no'];
@@ -112,6 +112,7 @@ export const endpoints = {
   generateHint: 'api/generate_hint',
   generateSolution: 'api/generate_solution',
   getExam: (examId) => `api/exam/${examId}`,
+  getPerformanceAnalysis: (examId) => `api/performance_analysis/${examId}`,
   getLessons: (subject, isClass10) => `api/lessons?subject=${subject}${isClass10 ? '&class10=true' : ''}`,
   getTests: 'api/tests',
   generateTest: 'api/generate_test',
@@ -150,6 +151,7 @@ export const api = {
     body: JSON.stringify(data)
   }),
   getExam: (examId) => apiRequest(endpoints.getExam(examId)),
+  getPerformanceAnalysis: (examId) => apiRequest(endpoints.getPerformanceAnalysis(examId)),
     generateHint: async (question, { onProgress = () => {} } = {}) => {
       const response = await apiRequest(endpoints.generateHint, {
         method: 'POST',